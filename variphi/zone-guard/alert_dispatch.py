@@ -0,0 +1,271 @@
+import ssl
+import json
+import asyncio
+import threading
+import concurrent.futures
+from datetime import datetime
+from urllib.parse import urlsplit
+
+class DeliveryError(Exception):
+    """A sink refused an alert; retry is False when sending it again cannot help"""
+
+    def __init__(self, message, retry=True):
+        super().__init__(message)
+        self.retry = retry
+
+class WebhookSink:
+    """POST each alert as JSON to an HTTP(S) endpoint over one kept-alive connection.
+
+    2xx is success. 429 and 5xx responses, timeouts and connection errors
+    are retried by the dispatcher; other statuses are not. A kept-alive
+    connection the server has meanwhile closed is reopened once without
+    counting as a failed attempt.
+    """
+
+    def __init__(self, url, timeout=5.0, headers=None):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Unsupported webhook URL: {url}")
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.host_header = parts.netloc.rpartition("@")[2]
+        self.path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        self.ssl = ssl.create_default_context() if parts.scheme == "https" else None
+        self.timeout = timeout
+        self.headers = dict(headers or {})
+        self.label = f"webhook {parts.scheme}://{self.host_header}{parts.path}"
+        self.reader = None
+        self.writer = None
+        self.connections = 0
+
+    def __str__(self):
+        return self.label
+
+    async def send(self, payload):
+        reused = self.writer is not None
+        try:
+            status = await self._post(payload)
+        except (OSError, EOFError):
+            if not reused:
+                raise
+            status = await self._post(payload)
+        if status == 429 or status >= 500:
+            raise DeliveryError(f"HTTP {status}")
+        if not 200 <= status < 300:
+            raise DeliveryError(f"HTTP {status}", retry=False)
+
+    async def _post(self, payload):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port, ssl=self.ssl), self.timeout)
+            self.connections += 1
+        head = [f"POST {self.path} HTTP/1.1", f"Host: {self.host_header}", "Content-Type: application/json",
+                f"Content-Length: {len(payload)}", "Connection: keep-alive"]
+        head += [f"{name}: {value}" for name, value in self.headers.items()]
+        try:
+            self.writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + payload)
+            await asyncio.wait_for(self.writer.drain(), self.timeout)
+            status, keep_alive = await asyncio.wait_for(self._read_response(), self.timeout)
+        except BaseException:
+            self.close()
+            raise
+        if not keep_alive:
+            self.close()
+        return status
+
+    async def _read_response(self):
+        """Read one response; returns (status, whether the connection stays open)"""
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed by the server")
+        version, status = status_line.decode("latin-1").split(None, 2)[:2]
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip().lower()
+
+        keep_alive = version == "HTTP/1.1" and headers.get("connection") != "close"
+        if "chunked" in headers.get("transfer-encoding", ""):
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    while (await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                await self.reader.readexactly(size + 2)
+        elif "content-length" in headers:
+            await self.reader.readexactly(int(headers["content-length"]))
+        else:
+            await self.reader.read()
+            keep_alive = False
+        return int(status), keep_alive
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+class UnixSocketSink:
+    """Write each alert as one line of JSON to a local UNIX stream socket.
+
+    The connection is kept open between alerts and reopened when the
+    consumer has gone away.
+    """
+
+    def __init__(self, path, timeout=5.0):
+        self.path = path
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+        self.connections = 0
+
+    def __str__(self):
+        return f"socket {self.path}"
+
+    async def send(self, payload):
+        if self.writer is not None and self.reader.at_eof():
+            self.close()
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.wait_for(asyncio.open_unix_connection(self.path), self.timeout)
+            self.connections += 1
+        try:
+            self.writer.write(payload + b"\n")
+            await asyncio.wait_for(self.writer.drain(), self.timeout)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+class AlertDispatcher:
+    """Deliver alerts to remote sinks from an asyncio loop on a daemon thread.
+
+    submit() only hands the alert to the loop, so the detection loop never
+    waits on the network. Each sink has its own bounded outbox and worker,
+    so a slow endpoint delays only itself; alerts arriving while its outbox
+    is full are dropped and counted. Failed deliveries are retried with
+    exponential backoff (retry_backoff, doubling up to max_backoff).
+    """
+
+    def __init__(self, sinks, outbox_size=1000, retries=3, retry_backoff=0.5, max_backoff=10.0, camera="",
+                 close_timeout=5.0):
+        self.sinks = list(sinks)
+        self.outbox_size = outbox_size
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.camera = camera
+        self.close_timeout = close_timeout
+        self.loop = None
+        self.dispatch_thread = None
+        self.outboxes = []
+        self.alerts_sent = 0
+        self.alerts_failed = 0
+        self.alerts_dropped = 0
+
+    @classmethod
+    def from_config(cls, config, camera=""):
+        """Dispatcher for the sinks configured in config, or None when there are none"""
+        timeout = config.get("alert_dispatch_timeout", 5.0)
+        sinks = []
+        if config.get("alert_webhook_url"):
+            sinks.append(WebhookSink(config["alert_webhook_url"], timeout, config.get("alert_webhook_headers")))
+        if config.get("alert_socket_path"):
+            sinks.append(UnixSocketSink(config["alert_socket_path"], timeout))
+        if not sinks:
+            return None
+        return cls(sinks, config.get("alert_outbox_size", 1000), config.get("alert_retries", 3),
+                   config.get("alert_retry_backoff", 0.5), camera=camera, close_timeout=timeout)
+
+    def start(self):
+        if self.loop is not None:
+            return
+        self.loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        self.dispatch_thread = threading.Thread(target=self._run, args=(ready,), name="alert-dispatch", daemon=True)
+        self.dispatch_thread.start()
+        ready.wait()
+
+    def _run(self, ready):
+        asyncio.set_event_loop(self.loop)
+        self.outboxes = [asyncio.Queue(maxsize=self.outbox_size) for _ in self.sinks]
+        workers = [self.loop.create_task(self._deliver(sink, outbox))
+                   for sink, outbox in zip(self.sinks, self.outboxes)]
+        ready.set()
+        self.loop.run_forever()
+        for worker in workers:
+            worker.cancel()
+        self.loop.run_until_complete(asyncio.gather(*workers, return_exceptions=True))
+        for sink in self.sinks:
+            sink.close()
+        # Let the closed transports shut their sockets
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.loop.close()
+
+    def submit(self, message, alert_type="warning", object_id=None, zone_name=None, event=None):
+        """Queue an alert for every sink (never blocks)"""
+        self.start()
+        alert = {
+            "time": datetime.now().isoformat(timespec="milliseconds"),
+            "camera": self.camera,
+            "type": alert_type,
+            "event": event,
+            "object_id": object_id,
+            "zone": zone_name,
+            "message": message,
+        }
+        self.loop.call_soon_threadsafe(self._enqueue, alert)
+
+    def _enqueue(self, alert):
+        payload = json.dumps(alert, default=str).encode("utf-8")
+        for outbox in self.outboxes:
+            try:
+                outbox.put_nowait(payload)
+            except asyncio.QueueFull:
+                self.alerts_dropped += 1
+
+    async def _deliver(self, sink, outbox):
+        while True:
+            payload = await outbox.get()
+            delay = self.retry_backoff
+            for attempt in range(self.retries + 1):
+                try:
+                    await sink.send(payload)
+                    self.alerts_sent += 1
+                    break
+                except (OSError, EOFError, ValueError, asyncio.TimeoutError, DeliveryError) as e:
+                    if attempt == self.retries or (isinstance(e, DeliveryError) and not e.retry):
+                        self.alerts_failed += 1
+                        print(f"Alert delivery to {sink} failed: {e!r}", flush=True)
+                        break
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.max_backoff)
+            outbox.task_done()
+
+    async def _drain(self, timeout):
+        await asyncio.wait_for(asyncio.gather(*(outbox.join() for outbox in self.outboxes)), timeout)
+
+    def pending(self):
+        """Alerts waiting in the outboxes"""
+        return sum(outbox.qsize() for outbox in self.outboxes)
+
+    def close(self, timeout=None):
+        """Deliver what is queued (waiting at most timeout seconds) and stop the loop"""
+        if self.loop is None:
+            return
+        if timeout is None:
+            timeout = self.close_timeout
+        drained = asyncio.run_coroutine_threadsafe(self._drain(timeout), self.loop)
+        try:
+            drained.result(timeout + 1.0)
+        except (asyncio.TimeoutError, concurrent.futures.TimeoutError):
+            print(f"Alert dispatch: {self.pending()} alerts not delivered before shutdown", flush=True)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.dispatch_thread.join(timeout)
+        self.loop = None
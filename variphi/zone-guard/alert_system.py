@@ -1,17 +1,198 @@
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import ttk
 import threading
 import time
 import json
 import queue
 import os
+from alert_dispatch import AlertDispatcher
+
+class AlertBoard:
+    """Coalesced view of recent alerts, one row per (object, zone).
+    
+    Repeated entries/exits of the same object and zone within
+    coalesce_seconds update the existing row (count, last event, last time)
+    instead of adding a new one. Rows whose object has exited, and plain
+    message alerts, disappear once they are older than coalesce_seconds;
+    objects still inside a zone stay listed as active intrusions. The
+    tracker may lose an object inside a zone without an exit, so an active
+    row with no new alert for active_seconds is dropped as well.
+    """
+    
+    def __init__(self, coalesce_seconds=10.0, active_seconds=300.0):
+        self.coalesce_seconds = coalesce_seconds
+        self.active_seconds = active_seconds
+        self.rows = {}  # key: row dict
+    
+    def apply(self, alert):
+        """Merge one alert into the board and return its row key"""
+        if alert.get("object_id") is not None:
+            key = ("object", alert["object_id"], alert["zone"])
+        else:
+            key = ("message", alert["message"])
+        now = alert["time"]
+        row = self.rows.get(key)
+        if row is None or now - row["last_time"] > self.coalesce_seconds and not row["active"]:
+            row = self.rows[key] = {
+                "zone": alert.get("zone", ""),
+                "object_id": alert.get("object_id"),
+                "message": alert["message"],
+                "type": alert["type"],
+                "count": 0,
+                "first_time": now,
+            }
+        row["count"] += 1
+        row["last_time"] = now
+        row["event"] = alert.get("event", "")
+        row["message"] = alert["message"]
+        row["active"] = alert.get("event") == "Entered"
+        return key
+    
+    def expire(self, now):
+        """Remove rows older than the window, or than active_seconds while still active"""
+        expired = [key for key, row in self.rows.items()
+                   if now - row["last_time"] > (self.active_seconds if row["active"] else self.coalesce_seconds)]
+        for key in expired:
+            del self.rows[key]
+        return expired
+    
+    def active_count(self):
+        return sum(1 for row in self.rows.values() if row["active"])
+
+class AlertThrottle:
+    """Deduplication and rate limiting for zone alerts.
+    
+    An object that keeps crossing a zone edge raises an Entered/Exited pair
+    every few frames. check() lets an alert through only if the same
+    (object, zone) has not alerted within cooldown_seconds and the global
+    token bucket (rate_per_second, burst) has a token left. Suppressed
+    alerts are counted per zone and event and reported as one summary
+    ("12 entries to Zone 2 in the last 30 s") once summary_seconds have
+    passed. A cooldown or rate of 0 disables that check.
+    
+    The exit of an object whose entry alert was shown always passes, so an
+    intrusion shown as active is always closed again; any other exit is
+    held back and counted. forget() drops the entries of objects the
+    tracker has lost.
+    
+    Due summaries come with the next check(); callers with a timer (the GUI)
+    also call flush() so they appear when activity stops. Both are
+    thread-safe.
+    """
+    
+    EVENT_NAMES = {"Entered": "entries to", "Exited": "exits from"}
+    
+    def __init__(self, cooldown_seconds=5.0, rate_per_second=2.0, burst=10, summary_seconds=30.0):
+        self.cooldown_seconds = cooldown_seconds
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.summary_seconds = summary_seconds
+        self.tokens = float(burst)
+        self.last_refill = None
+        self.last_alert = {}    # (object_id, zone): time of the last alert let through
+        self.shown_entries = set()  # (object_id, zone) with an entry alert but no exit yet
+        self.suppressed = {}    # (zone, event): count since the last summary
+        self.summary_start = None
+        self.alerts_suppressed = 0
+        self.lock = threading.Lock()
+    
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.get("alert_cooldown_seconds", 5.0), config.get("alert_rate_per_second", 2.0),
+                   config.get("alert_burst", 10), config.get("alert_summary_seconds", 30.0))
+    
+    def check(self, object_id, zone_name, event, now=None):
+        """Return (allowed, summaries) for one zone event"""
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            return self._check(object_id, zone_name, event, now)
+    
+    def _check(self, object_id, zone_name, event, now):
+        summaries = self._flush(now, False)
+        key = (object_id, zone_name)
+        if event == "Exited":
+            if key not in self.shown_entries:
+                self._suppress(zone_name, event, now)
+                return False, summaries
+            self.shown_entries.discard(key)
+            self.last_alert[key] = now
+            return True, summaries
+        last = self.last_alert.get(key)
+        if self.cooldown_seconds and last is not None and now - last < self.cooldown_seconds:
+            self._suppress(zone_name, event, now)
+            return False, summaries
+        if not self._take_token(now):
+            self._suppress(zone_name, event, now)
+            return False, summaries
+        if len(self.last_alert) > 4096:
+            self.last_alert = {k: t for k, t in self.last_alert.items() if now - t < self.cooldown_seconds}
+        self.last_alert[key] = now
+        if event == "Entered":
+            self.shown_entries.add(key)
+        return True, summaries
+    
+    def forget(self, object_ids):
+        """Drop the shown entries of objects that no longer exist"""
+        object_ids = set(object_ids)
+        with self.lock:
+            self.shown_entries = {key for key in self.shown_entries if key[0] not in object_ids}
+    
+    def _take_token(self, now):
+        if not self.rate_per_second:
+            return True
+        if self.last_refill is not None:
+            self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate_per_second)
+        self.last_refill = now
+        if self.tokens < 1.0:
+            return False
+        self.tokens -= 1.0
+        return True
+    
+    def _suppress(self, zone_name, event, now):
+        key = (zone_name, event)
+        self.suppressed[key] = self.suppressed.get(key, 0) + 1
+        self.alerts_suppressed += 1
+        if self.summary_start is None:
+            self.summary_start = now
+    
+    def flush(self, now=None, force=False):
+        """Summary messages for suppressed alerts once summary_seconds have passed (or when forced)"""
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            return self._flush(now, force)
+    
+    def _flush(self, now, force):
+        if self.summary_start is None:
+            return []
+        elapsed = now - self.summary_start
+        if elapsed < self.summary_seconds and not force:
+            return []
+        summaries = [f"{count} {self.EVENT_NAMES.get(event, event)} {zone_name} in the last {elapsed:.0f} s"
+                     for (zone_name, event), count in self.suppressed.items()]
+        self.suppressed = {}
+        self.summary_start = None
+        return summaries
 
 class AlertSystem:
+    """Tk alert window listing active intrusions without modal dialogs.
+    
+    show_alert() never blocks the detection loop: alerts go into a bounded
+    queue and are counted as dropped when it is full. The alert thread
+    drains the queue in batches into an AlertBoard and redraws a scrollable
+    list once per batch; it checks again quickly while alerts keep coming
+    and backs off when idle.
+    """
+    
+    IDLE_INTERVAL_MS = 250
+    BUSY_INTERVAL_MS = 10
+    
     def __init__(self):
         self.root = None
-        self.alert_queue = queue.Queue()
         self.alert_thread = None
         self.is_running = False
+        self.alerts_dropped = 0
         
         # Load config
         try:
@@ -19,6 +200,14 @@ class AlertSystem:
                 self.config = json.load(f)
         except FileNotFoundError:
             self.config = {"alert_enabled": True, "alert_type": "console"}
+        
+        self.alert_queue = queue.Queue(maxsize=self.config.get("alert_queue_size", 256))
+        self.batch_size = self.config.get("alert_batch_size", 100)
+        self.board = AlertBoard(self.config.get("alert_coalesce_seconds", 10.0),
+                                self.config.get("alert_active_seconds", 300.0))
+        self.throttle = AlertThrottle.from_config(self.config)
+        # Optional webhook / UNIX socket delivery
+        self.dispatcher = AlertDispatcher.from_config(self.config)
     
     def start(self):
         """Start the alert system with its own Tkinter root"""
@@ -30,8 +219,13 @@ class AlertSystem:
     def _run_alert_loop(self):
         """Run the alert loop in a separate thread"""
         self.root = tk.Tk()
-        self.root.withdraw()  # Hide the main window
+        self.root.withdraw()  # Shown when the first alert arrives
         self.root.title("Zone Guard Alerts")
+        self.root.geometry("520x260")
+        self.root.attributes("-topmost", True)
+        # Closing only hides the window; the next alert shows it again
+        self.root.protocol("WM_DELETE_WINDOW", self.root.withdraw)
+        self._build_window()
         
         # Process alerts
         self._process_alerts()
@@ -39,55 +233,128 @@ class AlertSystem:
         # Start the Tkinter main loop
         self.root.mainloop()
     
+    def _build_window(self):
+        """Create the alert list and status line"""
+        frame = ttk.Frame(self.root, padding=5)
+        frame.pack(fill=tk.BOTH, expand=True)
+        
+        columns = ('Zone', 'Object', 'Event', 'Count', 'Last')
+        self.alert_tree = ttk.Treeview(frame, columns=columns, show='headings', height=8)
+        for column, width in zip(columns, (110, 70, 140, 60, 80)):
+            self.alert_tree.heading(column, text=column)
+            self.alert_tree.column(column, width=width)
+        self.alert_tree.tag_configure('active', foreground='red')
+        scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=self.alert_tree.yview)
+        self.alert_tree.configure(yscrollcommand=scrollbar.set)
+        self.alert_tree.grid(row=0, column=0, sticky='nsew')
+        scrollbar.grid(row=0, column=1, sticky='ns')
+        
+        self.status_label = ttk.Label(frame, text="")
+        self.status_label.grid(row=1, column=0, columnspan=2, sticky='w', pady=(5, 0))
+        frame.columnconfigure(0, weight=1)
+        frame.rowconfigure(0, weight=1)
+    
     def _process_alerts(self):
-        """Process alerts from the queue"""
-        try:
-            while not self.alert_queue.empty():
+        """Drain up to batch_size queued alerts and refresh the window once"""
+        if not self.is_running:
+            return
+        changed = set()
+        for _ in range(self.batch_size):
+            try:
                 alert_data = self.alert_queue.get_nowait()
-                self._show_alert_dialog(alert_data)
-        except queue.Empty:
-            pass
+            except queue.Empty:
+                break
+            changed.add(self.board.apply(alert_data))
+        # Summaries are due even when no further alert arrives
+        for summary in self.throttle.flush():
+            self.show_alert(summary, "warning")
+        expired = self.board.expire(time.time())
         
-        # Schedule next check
-        if self.is_running:
-            self.root.after(100, self._process_alerts)
-    
-    def _show_alert_dialog(self, alert_data):
-        """Show alert dialog in the main thread"""
-        message = alert_data['message']
-        alert_type = alert_data['type']
+        if changed or expired:
+            self._refresh_window(changed, expired)
+            if changed and self.root.state() == "withdrawn":
+                self.root.deiconify()
         
-        if alert_type == "warning":
-            messagebox.showwarning("Zone Intrusion Alert", message)
-        elif alert_type == "info":
-            messagebox.showinfo("Zone Guard Info", message)
-        elif alert_type == "error":
-            messagebox.showerror("Zone Guard Error", message)
+        # Come back quickly while alerts keep arriving
+        busy = not self.alert_queue.empty()
+        self.root.after(self.BUSY_INTERVAL_MS if busy else self.IDLE_INTERVAL_MS, self._process_alerts)
+    
+    def _refresh_window(self, changed, expired):
+        """Update only the rows touched by the last batch"""
+        for key in expired:
+            item_id = self._item_id(key)
+            if self.alert_tree.exists(item_id):
+                self.alert_tree.delete(item_id)
+        for key in changed:
+            row = self.board.rows.get(key)
+            if row is None:
+                continue
+            item_id = self._item_id(key)
+            values = (row["zone"], "" if row["object_id"] is None else row["object_id"],
+                      row["event"] or row["message"], row["count"],
+                      time.strftime("%H:%M:%S", time.localtime(row["last_time"])))
+            tags = ('active',) if row["active"] else ()
+            if self.alert_tree.exists(item_id):
+                self.alert_tree.item(item_id, values=values, tags=tags)
+                self.alert_tree.move(item_id, '', 0)
+            else:
+                self.alert_tree.insert('', 0, iid=item_id, values=values, tags=tags)
+        
+        status = f"Active intrusions: {self.board.active_count()}"
+        if self.alerts_dropped:
+            status += f" | Dropped alerts: {self.alerts_dropped}"
+        self.status_label.config(text=status)
     
-    def show_alert(self, message, alert_type="warning"):
-        """Queue an alert to be shown"""
+    @staticmethod
+    def _item_id(key):
+        return "|".join(str(part) for part in key)
+    
+    def show_alert(self, message, alert_type="warning", object_id=None, zone_name=None, event=None):
+        """Queue an alert to be shown (never blocks; counts drops when full)"""
         if not self.config.get("alert_enabled", True):
             return
         
+        if self.dispatcher:
+            self.dispatcher.submit(message, alert_type, object_id, zone_name, event)
+        
         # Start the alert system if not running
         if not self.is_running:
             self.start()
         
         # Add alert to queue
-        self.alert_queue.put({
-            'message': message,
-            'type': alert_type
-        })
+        try:
+            self.alert_queue.put_nowait({
+                'message': message,
+                'type': alert_type,
+                'object_id': object_id,
+                'zone': zone_name or "",
+                'event': event or "",
+                'time': time.time(),
+            })
+        except queue.Full:
+            self.alerts_dropped += 1
     
     def show_entry_alert(self, object_id, zone_name):
         """Show alert when object enters zone"""
-        message = f"🚨 ALERT: Object {object_id} entered {zone_name}"
-        self.show_alert(message, "warning")
+        allowed, summaries = self.throttle.check(object_id, zone_name, "Entered")
+        for summary in summaries:
+            self.show_alert(summary, "warning")
+        if allowed:
+            message = f"🚨 ALERT: Object {object_id} entered {zone_name}"
+            self.show_alert(message, "warning", object_id, zone_name, "Entered")
     
     def show_exit_alert(self, object_id, zone_name):
         """Show alert when object exits zone"""
-        message = f"ℹ️ Object {object_id} exited {zone_name}"
-        self.show_alert(message, "info")
+        allowed, summaries = self.throttle.check(object_id, zone_name, "Exited")
+        for summary in summaries:
+            self.show_alert(summary, "warning")
+        if allowed:
+            message = f"ℹ️ Object {object_id} exited {zone_name}"
+            self.show_alert(message, "info", object_id, zone_name, "Exited")
+    
+    def forget_objects(self, object_ids):
+        """Objects the tracker has lost will not alert again"""
+        self.throttle.forget(object_ids)
     
     def show_console_alert(self, message, alert_type="info"):
         """Show alert in console (fallback when GUI is not available)"""
@@ -104,7 +371,14 @@ class AlertSystem:
     
     def cleanup(self):
         """Clean up the alert system"""
+        # The window is going away: print what the throttle still holds back
+        for summary in self.throttle.flush(force=True):
+            if self.dispatcher and self.config.get("alert_enabled", True):
+                self.dispatcher.submit(summary, "warning")
+            self.show_console_alert(summary, "warning")
         self.is_running = False
+        if self.dispatcher:
+            self.dispatcher.close()
         if self.root:
             try:
                 self.root.quit()
@@ -114,18 +388,26 @@ class AlertSystem:
 
 # Alternative alert system using console output (no threading issues)
 class ConsoleAlertSystem:
-    def __init__(self):
+    def __init__(self, camera=""):
         try:
             with open("config.json", "r") as f:
                 self.config = json.load(f)
         except FileNotFoundError:
             self.config = {"alert_enabled": True, "alert_type": "console"}
+        self.throttle = AlertThrottle.from_config(self.config)
+        # Optional webhook / UNIX socket delivery
+        self.dispatcher = AlertDispatcher.from_config(self.config, camera)
     
-    def show_alert(self, message, alert_type="warning"):
+    def show_alert(self, message, alert_type="warning", object_id=None, zone_name=None, event=None):
         """Show alert in console"""
         if not self.config.get("alert_enabled", True):
             return
         
+        if self.dispatcher:
+            self.dispatcher.submit(message, alert_type, object_id, zone_name, event)
+        if self.config.get("alert_type") == "remote":
+            return
+        
         timestamp = time.strftime("%H:%M:%S")
         if alert_type == "warning":
             print(f"[{timestamp}] 🚨 ALERT: {message}")
@@ -136,16 +418,47 @@ class ConsoleAlertSystem:
     
     def show_entry_alert(self, object_id, zone_name):
         """Show alert when object enters zone"""
-        message = f"Object {object_id} entered {zone_name}"
-        self.show_alert(message, "warning")
+        allowed, summaries = self.throttle.check(object_id, zone_name, "Entered")
+        for summary in summaries:
+            self.show_alert(summary, "warning")
+        if allowed:
+            self.show_alert(f"Object {object_id} entered {zone_name}", "warning", object_id, zone_name, "Entered")
     
     def show_exit_alert(self, object_id, zone_name):
         """Show alert when object exits zone"""
-        message = f"Object {object_id} exited {zone_name}"
-        self.show_alert(message, "info")
+        allowed, summaries = self.throttle.check(object_id, zone_name, "Exited")
+        for summary in summaries:
+            self.show_alert(summary, "warning")
+        if allowed:
+            self.show_alert(f"Object {object_id} exited {zone_name}", "info", object_id, zone_name, "Exited")
+    
+    def forget_objects(self, object_ids):
+        """Objects the tracker has lost will not alert again"""
+        self.throttle.forget(object_ids)
+    
+    def cleanup(self):
+        """Print a summary of alerts still held back and deliver queued remote alerts"""
+        for summary in self.throttle.flush(force=True):
+            self.show_alert(summary, "warning")
+        if self.dispatcher:
+            self.dispatcher.close()
+
+class NullAlertSystem:
+    """Alert system that shows nothing (benchmarks and detection replay)"""
+    
+    def show_alert(self, message, alert_type="warning", object_id=None, zone_name=None, event=None):
+        pass
+    
+    def show_entry_alert(self, object_id, zone_name):
+        pass
+    
+    def show_exit_alert(self, object_id, zone_name):
+        pass
+    
+    def forget_objects(self, object_ids):
+        pass
     
     def cleanup(self):
-        """Clean up (nothing to do for console alerts)"""
         pass
 
 def create_alert_system():
@@ -159,8 +472,12 @@ def create_alert_system():
     
     if alert_type == "gui":
         return AlertSystem()
-    else:
-        return ConsoleAlertSystem()
+    alerts = ConsoleAlertSystem()
+    if alert_type == "remote" and alerts.dispatcher is None:
+        print("alert_type is \"remote\" but no alert_webhook_url or alert_socket_path is set; "
+              "alerts are shown in the console")
+        alerts.config["alert_type"] = "console"
+    return alerts
 
 # Global alert system instance
 alert_system = create_alert_system()
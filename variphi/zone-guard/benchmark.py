@@ -0,0 +1,267 @@
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import platform
+import tempfile
+import subprocess
+import multiprocessing as mp
+from datetime import datetime
+import cv2
+import numpy as np
+
+DEFAULT_VIDEOS = ("video2.mp4", "video3.mp4")
+CROWD_SIZES = (10, 100, 1000)
+
+# ----------------- Helpers -----------------
+def latency_stats(samples):
+    """mean/p50/p95/p99 in microseconds for a list of durations in seconds"""
+    samples = np.asarray(samples, dtype=np.float64) * 1e6
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {"mean_us": round(float(samples.mean()), 2), "p50_us": round(float(p50), 2),
+            "p95_us": round(float(p95), 2), "p99_us": round(float(p99), 2)}
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None where unsupported)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0, 1)
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def crowd_walk(object_count, frame_count, width=1280, height=720, step=4.0, seed=0):
+    """Per-frame (N, 2) int centroids of a random-walking crowd"""
+    rng = np.random.default_rng(seed)
+    points = rng.uniform((0, 0), (width, height), size=(object_count, 2))
+    frames = []
+    for _ in range(frame_count):
+        points = np.clip(points + rng.normal(0.0, step, size=points.shape), 0, (width - 1, height - 1))
+        frames.append(points.astype(np.int64))
+    return frames
+
+def synthetic_video(path, frame_count=200, width=1280, height=720, fps=25, object_count=8, seed=0):
+    """Write a video of coloured blobs moving over a static noisy background"""
+    rng = np.random.default_rng(seed)
+    background = rng.integers(60, 120, size=(height, width, 3), dtype=np.uint8)
+    positions = rng.uniform((0, 0), (width, height), size=(object_count, 2))
+    velocities = rng.uniform(-8, 8, size=(object_count, 2))
+    colors = rng.integers(0, 255, size=(object_count, 3)).tolist()
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    for _ in range(frame_count):
+        frame = background.copy()
+        positions = (positions + velocities) % (width, height)
+        for (x, y), color in zip(positions.astype(int).tolist(), colors):
+            cv2.rectangle(frame, (x - 20, y - 40), (x + 20, y + 40), color, -1)
+        writer.write(frame)
+    writer.release()
+    return path
+
+# ----------------- Micro-benchmarks -----------------
+def bench_tracker(object_count, frame_count=100, distance_threshold=50):
+    """Per-frame CentroidTracker.update latency for a random-walking crowd"""
+    from tracker import CentroidTracker
+    frames = crowd_walk(object_count, frame_count)
+    tracker = CentroidTracker(distance_threshold)
+    class_names = ["person"] * object_count
+    confidences = [0.9] * object_count
+    samples = []
+    for points in frames:
+        points = [tuple(p) for p in points.tolist()]
+        start = time.perf_counter()
+        tracker.update(points, class_names, confidences)
+        samples.append(time.perf_counter() - start)
+    return dict(latency_stats(samples), tracks_created=tracker.object_id_count)
+
+def bench_zones(object_count, zones, frame_count=100, width=1280, height=720):
+    """Per-frame zone lookup latency: rasterized mask vs. pointPolygonTest loop"""
+    from zone_mask import ZoneMask, zone_polygon_arrays
+    frames = crowd_walk(object_count, frame_count, width, height)
+    mask = ZoneMask(zones, width, height)
+    polygons = zone_polygon_arrays(zones)
+
+    mask_samples, polygon_samples = [], []
+    for points in frames:
+        start = time.perf_counter()
+        mask.lookup(points)
+        mask_samples.append(time.perf_counter() - start)
+
+        point_list = points.tolist()
+        start = time.perf_counter()
+        for cx, cy in point_list:
+            for polygon_np in polygons:
+                if cv2.pointPolygonTest(polygon_np, (cx, cy), False) >= 0:
+                    break
+        polygon_samples.append(time.perf_counter() - start)
+    return {"mask": latency_stats(mask_samples), "point_polygon_test": latency_stats(polygon_samples)}
+
+def run_micro_benchmarks(zones, sizes=CROWD_SIZES, frame_count=100):
+    results = {"tracker": {}, "zones": {}}
+    for size in sizes:
+        results["tracker"][str(size)] = bench_tracker(size, frame_count)
+        results["zones"][str(size)] = bench_zones(size, zones, frame_count)
+        print(f"  {size} objects: tracker {results['tracker'][str(size)]['mean_us']} us, "
+              f"zone mask {results['zones'][str(size)]['mask']['mean_us']} us per frame", flush=True)
+    return results
+
+# ----------------- End-to-end -----------------
+def _run_pipeline_case(case, overrides, result_queue):
+    """Child process: run one headless pipeline and report its summary"""
+    from test_yolo import DetectionPipeline, load_config, load_zones
+    from alert_system import NullAlertSystem
+
+    config = load_config()
+    config.update(overrides)
+    config.update(video_source=case["video_source"], headless=True, save_video=False, event_clips=False,
+                  summary_file="", metrics_enabled=False, progress_interval=0,
+                  log_backend="csv", log_file=case["log_file"])
+    zones, zone_labels = load_zones(config["zones_file"])
+    pipeline = DetectionPipeline(config, zones, zone_labels, alerts=NullAlertSystem())
+    try:
+        summary = pipeline.run()
+    except RuntimeError as e:
+        result_queue.put({"error": str(e)})
+        return
+    summary["peak_rss_mb"] = peak_rss_mb()
+    result_queue.put(summary)
+
+def run_pipeline_case(name, video_source, overrides, work_dir):
+    """Run one end-to-end case in a fresh process so peak RSS is per case"""
+    context = mp.get_context("spawn")
+    result_queue = context.Queue()
+    case = {"video_source": video_source, "log_file": os.path.join(work_dir, f"{name}_logs.csv")}
+    process = context.Process(target=_run_pipeline_case, args=(case, overrides, result_queue))
+    process.start()
+    summary = None
+    while summary is None:
+        try:
+            summary = result_queue.get(timeout=1.0)
+        except queue.Empty:
+            if process.exitcode is not None:
+                summary = {"error": f"benchmark process exited with code {process.exitcode}"}
+    process.join()
+    if "error" in summary:
+        raise RuntimeError(f"{name}: {summary['error']}")
+    keep = ("frames", "elapsed_seconds", "fps", "events", "objects", "frames_skipped", "peak_rss_mb", "stages")
+    return dict({"name": name, "video_source": os.path.basename(video_source)},
+                **{key: summary[key] for key in keep if key in summary})
+
+# ----------------- Comparison -----------------
+def compare_results(baseline, current, tolerance=0.10):
+    """Lines describing fps and micro-benchmark changes; regressions are flagged"""
+    lines = []
+    regressions = 0
+    baseline_cases = {case["name"]: case for case in baseline.get("cases", [])}
+    for case in current.get("cases", []):
+        old = baseline_cases.get(case["name"])
+        if not old or not old.get("fps"):
+            continue
+        change = case["fps"] / old["fps"] - 1.0
+        flag = change < -tolerance
+        regressions += flag
+        lines.append(f"{case['name']}: {old['fps']} -> {case['fps']} fps ({change:+.1%})"
+                     + (" REGRESSION" if flag else ""))
+        if case.get("events") != old.get("events"):
+            lines.append(f"{case['name']}: events changed {old.get('events')} -> {case.get('events')}")
+
+    for bench, key in (("tracker", None), ("zones", "mask")):
+        for size, stats in current.get("micro", {}).get(bench, {}).items():
+            old = baseline.get("micro", {}).get(bench, {}).get(size)
+            if not old:
+                continue
+            old_mean = (old[key] if key else old)["mean_us"]
+            new_mean = (stats[key] if key else stats)["mean_us"]
+            change = new_mean / old_mean - 1.0 if old_mean else 0.0
+            flag = change > tolerance
+            regressions += flag
+            lines.append(f"{bench} {size} objects: {old_mean} -> {new_mean} us ({change:+.1%})"
+                         + (" REGRESSION" if flag else ""))
+    return lines, regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Zone Guard pipeline")
+    parser.add_argument("--videos", nargs="*", default=list(DEFAULT_VIDEOS), help="Video files to run end-to-end")
+    parser.add_argument("--synthetic", type=int, default=1, help="Number of synthetic streams to generate and run")
+    parser.add_argument("--synthetic-frames", type=int, default=200)
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=JSON",
+                        help="Config override for end-to-end runs, e.g. --set inference_batch_size=4")
+    parser.add_argument("--micro-only", action="store_true", help="Only run tracker/zone micro-benchmarks")
+    parser.add_argument("--skip-micro", action="store_true", help="Skip tracker/zone micro-benchmarks")
+    parser.add_argument("--micro-frames", type=int, default=100)
+    parser.add_argument("--output", help="Result file (default: benchmark_results/<commit>.json)")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Relative change counted as a regression")
+    args = parser.parse_args()
+
+    overrides = {}
+    for item in args.set:
+        key, value = item.split("=", 1)
+        overrides[key] = json.loads(value)
+
+    from test_yolo import load_config, load_zones
+    config = load_config()
+    config.update(overrides)
+    zones, _ = load_zones(config["zones_file"])
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(),
+                    "cpus": os.cpu_count()},
+        "overrides": overrides,
+        "cases": [],
+    }
+
+    if not args.micro_only:
+        with tempfile.TemporaryDirectory() as work_dir:
+            sources = []
+            for video in args.videos:
+                if os.path.exists(video):
+                    sources.append((os.path.splitext(os.path.basename(video))[0], video))
+                else:
+                    print(f"Skipping missing video: {video}")
+            for idx in range(args.synthetic):
+                path = os.path.join(work_dir, f"synthetic{idx + 1}.mp4")
+                synthetic_video(path, args.synthetic_frames, seed=idx)
+                sources.append((f"synthetic{idx + 1}", path))
+            for name, source in sources:
+                print(f"Running {name}...", flush=True)
+                case = run_pipeline_case(name, source, overrides, work_dir)
+                results["cases"].append(case)
+                print(f"  {case['frames']} frames, {case['fps']} fps, {case['events']} events, "
+                      f"peak RSS {case['peak_rss_mb']} MB", flush=True)
+
+    if not args.skip_micro:
+        print("Micro-benchmarks (per frame):", flush=True)
+        results["micro"] = run_micro_benchmarks(zones, frame_count=args.micro_frames)
+
+    output = args.output or os.path.join("benchmark_results", f"{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=4)
+    print(f"Results saved to: {output}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        lines, regressions = compare_results(baseline, results, args.tolerance)
+        print(f"\nCompared with {baseline.get('commit', args.compare)}:")
+        for line in lines:
+            print(f"  {line}")
+        if regressions:
+            print(f"{regressions} regressions beyond {args.tolerance:.0%}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+import os
+import csv
+import time
+import queue
+import atexit
+import sqlite3
+import threading
+
+LOG_COLUMNS = ["Timestamp", "ObjectID", "Zone", "Event", "Class", "Confidence", "Clip", "Frame", "Camera"]
+
+class BatchedEventSink:
+    """Write event rows from a background thread in batches.
+
+    write() only queues the row. The writer thread collects rows into a
+    batch and hands it to _write_batch() when batch_size rows are waiting or
+    flush_interval seconds have passed since the first unwritten row, so
+    disk latency never blocks the frame loop. fsync_policy controls
+    durability:
+
+    - "never": leave syncing to the OS
+    - "batch": sync after every flushed batch
+    - "close": sync once when the sink is closed
+
+    close() is registered with atexit, so queued rows are flushed even when
+    the detection loop dies with an exception or Ctrl-C.
+
+    Storage errors (disk full, database locked) are caught in the writer
+    thread: the failed batch is counted in rows_dropped, the first error is
+    kept in .error and writing continues with the next batch. If the queue
+    is full or the writer has died, write() drops the row instead of
+    blocking, and close() waits at most close_timeout seconds.
+    """
+
+    FSYNC_POLICIES = ("never", "batch", "close")
+
+    def __init__(self, batch_size=50, flush_interval=1.0, fsync_policy="close", queue_size=10000,
+                 close_timeout=10.0):
+        if fsync_policy not in self.FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync_policy}")
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.fsync_policy = fsync_policy
+        self.close_timeout = close_timeout
+        self.row_queue = queue.Queue(maxsize=queue_size)
+        self.rows_written = 0
+        self.batches_written = 0
+        self.rows_dropped = 0
+        self.error = None
+        self.closed = False
+
+    def start(self):
+        """Start the writer thread (called by subclasses once storage is open)"""
+        self.writer_thread = threading.Thread(target=self._run_writer_loop, daemon=True)
+        self.writer_thread.start()
+        atexit.register(self.close)
+        return self
+
+    def write(self, row):
+        """Queue one event row (dropped and counted when the writer cannot keep up)"""
+        if not self.writer_thread.is_alive():
+            self.rows_dropped += 1
+            return
+        try:
+            self.row_queue.put_nowait(row)
+        except queue.Full:
+            self.rows_dropped += 1
+
+    def _run_writer_loop(self):
+        """Collect rows into batches and flush on size or age"""
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                row = self.row_queue.get(timeout=timeout)
+            except queue.Empty:
+                row = False  # flush interval elapsed
+            if row is None:
+                break
+            if row is not False:
+                batch.append(row)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._write_batch(batch)
+                batch = []
+                deadline = None
+        # Drain anything queued after the stop marker was sent
+        while True:
+            try:
+                row = self.row_queue.get_nowait()
+            except queue.Empty:
+                break
+            if row is not None:
+                batch.append(row)
+        if batch:
+            self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        """Persist a batch of rows"""
+        try:
+            self._store_rows(batch)
+        except Exception as e:
+            self.rows_dropped += len(batch)
+            if self.error is None:
+                print(f"Event log write failed, dropping rows: {e!r}")
+            self.error = e
+            return
+        self.rows_written += len(batch)
+        self.batches_written += 1
+
+    def _store_rows(self, rows):
+        raise NotImplementedError
+
+    def _close_storage(self):
+        raise NotImplementedError
+
+    def close(self):
+        """Flush every queued row and close storage (safe to call twice)"""
+        if self.closed:
+            return
+        self.closed = True
+        atexit.unregister(self.close)
+        if self.writer_thread.is_alive():
+            try:
+                self.row_queue.put(None, timeout=self.close_timeout)
+            except queue.Full:
+                pass
+            self.writer_thread.join(self.close_timeout)
+        if self.writer_thread.is_alive():
+            # Leave the storage to the stuck writer rather than closing it underneath
+            print(f"Event log writer did not finish; {self.row_queue.qsize()} rows not written")
+            return
+        if self.rows_dropped:
+            print(f"Event log: {self.rows_dropped} rows could not be written")
+        try:
+            self._close_storage()
+        except Exception as e:
+            print(f"Event log close failed: {e!r}")
+            self.error = self.error or e
+
+class CsvEventSink(BatchedEventSink):
+    """Batched event sink writing a CSV file with a header row"""
+
+    def __init__(self, path, batch_size=50, flush_interval=1.0, fsync_policy="close",
+                 columns=LOG_COLUMNS, queue_size=10000, close_timeout=10.0):
+        super().__init__(batch_size, flush_interval, fsync_policy, queue_size, close_timeout)
+        self.path = path
+        self.file_handle = open(path, "w", newline="")
+        self.csv_writer = csv.writer(self.file_handle)
+        self.csv_writer.writerow(columns)
+        self.file_handle.flush()
+        self.start()
+
+    def _store_rows(self, rows):
+        self.csv_writer.writerows(rows)
+        self.file_handle.flush()
+        if self.fsync_policy == "batch":
+            os.fsync(self.file_handle.fileno())
+
+    def _close_storage(self):
+        self.file_handle.flush()
+        if self.fsync_policy in ("batch", "close"):
+            os.fsync(self.file_handle.fileno())
+        self.file_handle.close()
+
+class CsvTailReader:
+    """Read only the rows appended to a CSV log since the last call.
+
+    The reader remembers its byte offset, the file identity and the last
+    line it consumed. read() returns (reset, rows): reset is True when the
+    file was truncated, replaced (rotation), rewritten in place or opened
+    for the first time, meaning previously returned rows are stale. A file
+    reopened with "w" that has already grown past the old offset is caught
+    because the bytes just before the offset no longer match that last
+    line. Incomplete trailing lines are left for the next call. On the first
+    read of a large file only the last initial_bytes are parsed, since the
+    caller only shows the newest rows anyway.
+    """
+
+    def __init__(self, path, initial_bytes=256 * 1024):
+        self.path = path
+        self.initial_bytes = initial_bytes
+        self.offset = 0
+        self.file_id = None
+        self.columns = None
+        self.last_line = b""
+
+    def reset(self):
+        """Forget the position; the next read() starts over and reports a reset"""
+        self.offset = 0
+        self.file_id = None
+        self.columns = None
+        self.last_line = b""
+
+    def _rewritten(self, f):
+        """True when the line ending at offset is not the one read last time"""
+        f.seek(self.offset - len(self.last_line))
+        return f.read(len(self.last_line)) != self.last_line
+
+    def read(self):
+        """Return (reset, rows) with rows as dicts keyed by the header"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            reset = self.file_id is not None
+            self.reset()
+            return reset, []
+
+        reset = False
+        file_id = (stat.st_dev, stat.st_ino)
+        if file_id != self.file_id or stat.st_size < self.offset:
+            reset = True
+            self.reset()
+            self.file_id = file_id
+        if stat.st_size == self.offset:
+            return reset, []
+
+        with open(self.path, "rb") as f:
+            if self.columns is not None and self._rewritten(f):
+                reset = True
+                self.reset()
+                self.file_id = file_id
+            if self.columns is None:
+                f.seek(0)
+                header = f.readline()
+                if not header.endswith(b"\n"):
+                    return reset, []
+                self.columns = next(csv.reader([header.decode("utf-8")]))
+                self.offset = f.tell()
+                self.last_line = header
+                # Skip straight to the tail of a large existing file
+                if stat.st_size - self.offset > self.initial_bytes:
+                    f.seek(stat.st_size - self.initial_bytes)
+                    # The skipped partial line is the end of the line before offset
+                    self.last_line = f.readline()
+                    self.offset = f.tell()
+            f.seek(self.offset)
+            data = f.read()
+
+        end = data.rfind(b"\n")
+        if end < 0:
+            return reset, []
+        self.offset += end + 1
+        self.last_line = data[data.rfind(b"\n", 0, end) + 1:end + 1]
+        lines = data[:end].decode("utf-8").splitlines()
+        rows = [dict(zip(self.columns, values)) for values in csv.reader(lines) if values]
+        return reset, rows
+
+# ----------------- SQLite Event Store -----------------
+EVENTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    object_id INTEGER,
+    zone TEXT,
+    event TEXT,
+    class TEXT,
+    confidence REAL,
+    clip TEXT,
+    frame INTEGER,
+    camera TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events (timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_zone ON events (zone, timestamp);
+"""
+
+def open_events_db(path):
+    """Open (and create if needed) the events database in WAL mode"""
+    connection = sqlite3.connect(path, check_same_thread=False)
+    # WAL lets the GUI read while the detector is writing
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript(EVENTS_SCHEMA)
+    # Databases created before multi-camera support lack the camera column
+    columns = [info[1] for info in connection.execute("PRAGMA table_info(events)")]
+    if "camera" not in columns:
+        with connection:
+            connection.execute("ALTER TABLE events ADD COLUMN camera TEXT")
+    return connection
+
+def _sqlite_row(row):
+    """Convert a log row (LOG_COLUMNS order) into SQLite-friendly values"""
+    # Rows may omit trailing columns (e.g. no camera name for a single source)
+    row = list(row) + [None] * (len(LOG_COLUMNS) - len(row))
+    timestamp, object_id, zone, event, class_name, confidence, clip, frame, camera = row
+    return (timestamp, int(object_id), str(zone), event, class_name,
+            None if confidence is None else float(confidence), clip or None,
+            None if frame is None else int(frame), camera or None)
+
+class SqliteEventSink(BatchedEventSink):
+    """Batched event sink inserting into an indexed SQLite table.
+
+    Each batch is one executemany() inside a single transaction. Unlike the
+    CSV log, the database keeps events from previous runs.
+    """
+
+    def __init__(self, path, batch_size=50, flush_interval=1.0, fsync_policy="close", queue_size=10000,
+                 close_timeout=10.0):
+        super().__init__(batch_size, flush_interval, fsync_policy, queue_size, close_timeout)
+        self.path = path
+        self.connection = open_events_db(path)
+        self.connection.execute(f"PRAGMA synchronous={'FULL' if fsync_policy == 'batch' else 'NORMAL'}")
+        self.start()
+
+    def _store_rows(self, rows):
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO events (timestamp, object_id, zone, event, class, confidence, clip, frame, camera) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [_sqlite_row(row) for row in rows])
+
+    def _close_storage(self):
+        if self.fsync_policy == "close":
+            self.connection.execute("PRAGMA wal_checkpoint(FULL)")
+        self.connection.close()
+
+def recent_events(path, limit=50):
+    """Newest events from the database as LOG_COLUMNS-style dicts, oldest first"""
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = connection.execute(
+            "SELECT timestamp, object_id, zone, event, class, confidence, clip, frame, camera "
+            "FROM events ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    finally:
+        connection.close()
+    return [dict(zip(LOG_COLUMNS, row)) for row in reversed(rows)]
+
+def query_events(path, zone=None, event=None, since=None, until=None, camera=None):
+    """Events filtered by zone, event type and timestamp range (uses the indexes).
+
+    Timestamps use the log format, e.g. query_events("events.db", zone="2",
+    event="Entered", since="2025-08-28 20:00:00", until="2025-08-29 06:00:00").
+    """
+    clauses, params = [], []
+    for column, value in (("zone", zone), ("event", event), ("camera", camera)):
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            params.append(str(value))
+    if since is not None:
+        clauses.append("timestamp >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append("timestamp < ?")
+        params.append(until)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = connection.execute(
+            "SELECT timestamp, object_id, zone, event, class, confidence, clip, frame, camera "
+            f"FROM events{where} ORDER BY timestamp, id", params).fetchall()
+    finally:
+        connection.close()
+    return [dict(zip(LOG_COLUMNS, row)) for row in rows]
+
+def create_event_sink(backend, log_file, events_db, batch_size=50, flush_interval=1.0, fsync_policy="close"):
+    """Create the event sink selected by the log_backend setting"""
+    if backend == "sqlite":
+        return SqliteEventSink(events_db, batch_size, flush_interval, fsync_policy)
+    if backend == "csv":
+        return CsvEventSink(log_file, batch_size, flush_interval, fsync_policy)
+    raise ValueError(f"Unknown log backend: {backend}")
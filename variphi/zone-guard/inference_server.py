@@ -0,0 +1,221 @@
+import os
+import time
+import queue
+import signal
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+
+class FrameSlots:
+    """Fixed-size frame slots in a shared memory block owned by one client.
+
+    The client copies frames into slots and only sends (slot, shape) to the
+    server, which maps the same memory, so frames are never pickled.
+    """
+
+    def __init__(self, slot_count, slot_bytes):
+        self.slot_count = slot_count
+        self.slot_bytes = slot_bytes
+        self.shm = shared_memory.SharedMemory(create=True, size=slot_count * slot_bytes)
+        self.name = self.shm.name
+
+    def view(self, slot, shape):
+        return slot_view(self.shm, self.slot_bytes, slot, shape)
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+def slot_view(shm, slot_bytes, slot, shape):
+    """uint8 array of the given shape over one slot of a shared memory block"""
+    return np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=slot * slot_bytes)
+
+def run_inference_server(config, request_queue, response_queues, max_batch_size, max_wait):
+    """Server process: batch frame requests from all clients into one predict() call.
+
+    A request is (client, shm_name, slot_bytes, slot, shape, request_id). The
+    first request of a batch waits at most max_wait seconds for others to
+    arrive, so a lone camera pays only that much extra latency.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from model_backend import load_model, detections_from_result
+
+    model = load_model(config["model_path"], config["model_backend"], config["model_int8"],
+                       config["inference_imgsz"])
+    print(f"Inference server ready (batch up to {max_batch_size}, wait {max_wait * 1000:.0f} ms)", flush=True)
+    attached = {}   # client: {shm_name: SharedMemory}
+    while True:
+        request = request_queue.get()
+        if request is None:
+            break
+        batch = [request]
+        deadline = time.monotonic() + max_wait
+        stopping = False
+        while len(batch) < max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                request = request_queue.get(timeout=timeout) if timeout > 0 else request_queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                stopping = True
+                break
+            batch.append(request)
+
+        frames = []
+        for client, shm_name, slot_bytes, slot, shape, _ in batch:
+            client_blocks = attached.setdefault(client, {})
+            shm = client_blocks.get(shm_name)
+            if shm is None:
+                # A client uses at most its own slots and its capture ring;
+                # anything more means it restarted with new blocks
+                if len(client_blocks) >= 2:
+                    for old_shm in client_blocks.values():
+                        old_shm.close()
+                    client_blocks.clear()
+                shm = client_blocks[shm_name] = shared_memory.SharedMemory(name=shm_name)
+            frames.append(slot_view(shm, slot_bytes, slot, shape))
+
+        results = model.predict(source=frames, imgsz=config["inference_imgsz"], classes=config["classes"],
+                                conf=config["confidence_threshold"], save=False, verbose=False)
+        del frames
+        for (client, _, _, _, _, request_id), result in zip(batch, results):
+            response_queues[client].put((request_id, detections_from_result(result)))
+        if stopping:
+            break
+    for client_blocks in attached.values():
+        for shm in client_blocks.values():
+            shm.close()
+
+def server_settings(cameras):
+    """Model settings shared by every camera served by one inference server.
+
+    Model, backend and input size must agree. The server runs with the union
+    of detection classes and the lowest confidence threshold; each camera's
+    pipeline filters the returned boxes with its own settings.
+    """
+    first = cameras[0]
+    settings = {key: first[key] for key in ("model_path", "model_backend", "model_int8", "inference_imgsz")}
+    for camera in cameras[1:]:
+        for key, value in settings.items():
+            if camera[key] != value:
+                raise ValueError(f"Camera '{camera['name']}' sets {key}={camera[key]!r}, but cameras sharing "
+                                 f"the inference server must use {value!r}")
+    # Cameras share one input size, so automatic sizing can't follow each ROI crop
+    from model_backend import inference_size
+    settings["inference_imgsz"] = inference_size(settings["inference_imgsz"])
+    settings["classes"] = sorted({class_id for camera in cameras
+                                  for class_id in camera["detection_classes"].values()})
+    settings["confidence_threshold"] = min(camera["confidence_threshold"] for camera in cameras)
+    return settings
+
+class InferenceServer:
+    """Owner-side handle of the shared inference server process"""
+
+    def __init__(self, settings, client_names, max_batch_size=8, max_wait=0.01):
+        self.settings = settings
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.context = mp.get_context("spawn")
+        self.request_queue = self.context.Queue()
+        self.response_queues = {name: self.context.Queue() for name in client_names}
+        self.process = None
+
+    def start(self):
+        self.process = self.context.Process(
+            target=run_inference_server,
+            args=(self.settings, self.request_queue, self.response_queues, self.max_batch_size, self.max_wait),
+            name="zone-guard-inference", daemon=True)
+        self.process.start()
+        print(f"Started inference server (pid {self.process.pid})", flush=True)
+        return self
+
+    def client_handle(self, name):
+        """Picklable connection details for one client process"""
+        return InferenceClientHandle(name, self.request_queue, self.response_queues[name])
+
+    def stop(self, timeout=10.0):
+        if self.process is None:
+            return
+        if self.process.exitcode is None:
+            self.request_queue.put(None)
+            self.process.join(timeout)
+            if self.process.exitcode is None:
+                self.process.terminate()
+        self.process.join()
+
+class InferenceClientHandle:
+    """What a worker needs to reach the server (passed as a process argument)"""
+
+    def __init__(self, name, request_queue, response_queue):
+        self.name = name
+        self.request_queue = request_queue
+        self.response_queue = response_queue
+
+class InferenceClient:
+    """Detector that sends frames to the shared inference server.
+
+    detect() copies each frame into a shared memory slot, queues one request
+    per frame and waits for the Detections. Frames that already live in the
+    pipeline's SharedFrameRing (frame_ring) are sent by slot index without
+    any copy. A missing response within
+    timeout seconds raises RuntimeError, so a worker fails (and is restarted)
+    instead of hanging when the server dies.
+    """
+
+    def __init__(self, handle, slot_count=8, timeout=30.0):
+        self.name = handle.name
+        self.request_queue = handle.request_queue
+        self.response_queue = handle.response_queue
+        self.slot_count = slot_count
+        self.timeout = timeout
+        self.slots = None
+        self.frame_ring = None
+        self.next_request_id = 0
+
+    def __str__(self):
+        return f"inference server client '{self.name}'"
+
+    def _ensure_slots(self, frames):
+        slot_bytes = max(frame.nbytes for frame in frames)
+        count = max(self.slot_count, len(frames))
+        if self.slots is None or self.slots.slot_bytes < slot_bytes or self.slots.slot_count < count:
+            if self.slots is not None:
+                self.slots.close()
+            self.slots = FrameSlots(count, slot_bytes)
+
+    def detect(self, frames):
+        """Detections for each frame, in order"""
+        if not frames:
+            return []
+        request_ids = []
+        for index, frame in enumerate(frames):
+            ring_slot = self.frame_ring.slot_of(frame) if self.frame_ring is not None else None
+            if ring_slot is not None:
+                block = (self.frame_ring.name, self.frame_ring.slot_bytes, ring_slot)
+            else:
+                self._ensure_slots(frames)
+                np.copyto(self.slots.view(index, frame.shape), frame)
+                block = (self.slots.name, self.slots.slot_bytes, index)
+            # The pid keeps ids unique across worker restarts
+            request_id = (os.getpid(), self.next_request_id)
+            self.next_request_id += 1
+            request_ids.append(request_id)
+            self.request_queue.put((self.name,) + block + (frame.shape, request_id))
+
+        results = {}
+        deadline = time.monotonic() + self.timeout
+        while len(results) < len(request_ids):
+            try:
+                request_id, detections = self.response_queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise RuntimeError("Inference server did not respond")
+            # Responses left over from a previous (restarted) worker are ignored
+            if request_id in request_ids:
+                results[request_id] = detections
+        return [results[request_id] for request_id in request_ids]
+
+    def close(self):
+        if self.slots is not None:
+            self.slots.close()
+            self.slots = None
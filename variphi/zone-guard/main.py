@@ -5,8 +5,9 @@ import sys
 import os
 import json
 import threading
-import pandas as pd
+import queue
 from datetime import datetime
+from event_log import recent_events, CsvTailReader
 
 class ZoneGuardApp:
     def __init__(self, root):
@@ -18,6 +19,16 @@ class ZoneGuardApp:
         # Load config
         self.load_config()
         
+        # Managed child process (zone drawing or detection)
+        self.child_process = None
+        self.child_name = None
+        self.child_output = queue.Queue()
+        self.child_stop_requested = False
+        
+        # Recent Events panel state: incremental CSV reader and row cap
+        self.log_panel_rows = self.config.get("log_panel_rows", 50)
+        self.log_tail = CsvTailReader(self.config.get("log_file", "logs.csv"))
+        
         # Create main frame
         self.main_frame = ttk.Frame(root)
         self.main_frame.pack(fill='both', expand=True, padx=20, pady=20)
@@ -54,6 +65,9 @@ class ZoneGuardApp:
         # Start periodic updates
         self.root.after(5000, self.periodic_update)
         
+        # Don't leave a detection run orphaned when the window closes
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
     def load_config(self):
         """Load configuration file"""
         try:
@@ -89,6 +103,9 @@ class ZoneGuardApp:
                   style='Action.TButton').pack(side='left', padx=5)
         ttk.Button(row1, text="🎥 Start Detection", command=self.start_detection, 
                   style='Action.TButton').pack(side='left', padx=5)
+        self.stop_button = ttk.Button(row1, text="⏹ Stop", command=self.stop_child,
+                                      style='Action.TButton', state='disabled')
+        self.stop_button.pack(side='left', padx=5)
         ttk.Button(row1, text="📊 View Logs", command=self.view_logs, 
                   style='Action.TButton').pack(side='left', padx=5)
         
@@ -131,6 +148,11 @@ class ZoneGuardApp:
         ttk.Label(status_grid, text="Log File:").grid(row=1, column=2, sticky='w', padx=5)
         self.log_label = ttk.Label(status_grid, text=self.config.get("log_file", "Not set"))
         self.log_label.grid(row=1, column=3, sticky='w', padx=5)
+        
+        # Child process status
+        ttk.Label(status_grid, text="Process:").grid(row=2, column=0, sticky='w', padx=5)
+        self.process_label = ttk.Label(status_grid, text="Idle")
+        self.process_label.grid(row=2, column=1, columnspan=3, sticky='w', padx=5)
     
     def create_logs_display(self):
         """Create logs display area"""
@@ -188,34 +210,55 @@ class ZoneGuardApp:
             self.model_label.config(text=f"{model_file} (not found)", foreground='red')
         
         # Check log file
-        log_file = self.config.get("log_file", "logs.csv")
+        log_file = self.get_log_path()
         if os.path.exists(log_file):
             self.log_label.config(text=log_file, foreground='green')
         else:
             self.log_label.config(text=f"{log_file} (not created yet)", foreground='orange')
     
+    def get_log_path(self):
+        """Path of the event log for the configured backend"""
+        if self.config.get("log_backend", "csv") == "sqlite":
+            return self.config.get("events_db", "events.db")
+        return self.config.get("log_file", "logs.csv")
+    
     def refresh_logs(self):
         """Refresh the logs display"""
-        # Clear existing items
-        for item in self.logs_tree.get_children():
-            self.logs_tree.delete(item)
-        
-        # Load and display logs
-        log_file = self.config.get("log_file", "logs.csv")
-        if os.path.exists(log_file):
-            try:
-                df = pd.read_csv(log_file)
-                # Display last 50 entries
-                for _, row in df.tail(50).iterrows():
-                    self.logs_tree.insert('', 'end', values=(
-                        row.get('Timestamp', ''),
-                        row.get('ObjectID', ''),
-                        row.get('Zone', ''),
-                        row.get('Event', ''),
-                        row.get('Class', '')
-                    ))
-            except Exception as e:
-                messagebox.showerror("Error", f"Could not load logs: {e}")
+        log_file = self.get_log_path()
+        try:
+            if self.config.get("log_backend", "csv") == "sqlite":
+                # Indexed query for just the newest rows instead of a full scan
+                self.clear_logs_display()
+                if os.path.exists(log_file):
+                    self.append_log_rows(recent_events(log_file, self.log_panel_rows))
+            else:
+                # Only parse lines appended since the last refresh
+                reset, rows = self.log_tail.read()
+                if reset:
+                    self.clear_logs_display()
+                self.append_log_rows(rows)
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not load logs: {e}")
+    
+    def clear_logs_display(self):
+        """Remove every row from the logs display"""
+        children = self.logs_tree.get_children()
+        if children:
+            self.logs_tree.delete(*children)
+    
+    def append_log_rows(self, rows):
+        """Append new log rows and drop the oldest beyond log_panel_rows"""
+        for row in rows[-self.log_panel_rows:]:
+            self.logs_tree.insert('', 'end', values=(
+                row.get('Timestamp', ''),
+                row.get('ObjectID', ''),
+                row.get('Zone', ''),
+                row.get('Event', ''),
+                row.get('Class', '')
+            ))
+        children = self.logs_tree.get_children()
+        if len(children) > self.log_panel_rows:
+            self.logs_tree.delete(*children[:len(children) - self.log_panel_rows])
     
     def periodic_update(self):
         """Periodically update status and logs"""
@@ -223,16 +266,104 @@ class ZoneGuardApp:
         self.refresh_logs()
         self.root.after(10000, self.periodic_update)  # Update every 10 seconds
     
+    def launch_child(self, script, name):
+        """Start a script as a managed child process without blocking Tk"""
+        if self.child_process and self.child_process.poll() is None:
+            messagebox.showwarning("Busy", f"{self.child_name} is already running.")
+            return False
+        if not os.path.exists(script):
+            messagebox.showerror("Error", f"{script} not found!")
+            return False
+        
+        self.child_process = subprocess.Popen(
+            [sys.executable, "-u", script],
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            text=True, bufsize=1)
+        self.child_name = name
+        self.child_stop_requested = False
+        self.child_output = queue.Queue()
+        # Pipe reads block, so they happen on a watcher thread
+        threading.Thread(target=self._watch_child_output,
+                         args=(self.child_process, self.child_output), daemon=True).start()
+        
+        self.stop_button.config(state='normal')
+        self.process_label.config(text=f"{name} running (pid {self.child_process.pid})", foreground='blue')
+        self.root.after(500, self.poll_child)
+        return True
+    
+    def _watch_child_output(self, process, output):
+        """Forward child output lines to the Tk thread through a queue"""
+        for line in process.stdout:
+            output.put(line.rstrip())
+        process.stdout.close()
+    
+    def poll_child(self):
+        """Show child progress and handle its exit; reschedules itself via root.after"""
+        process = self.child_process
+        if process is None:
+            return
+        
+        progress = None
+        while True:
+            try:
+                line = self.child_output.get_nowait()
+            except queue.Empty:
+                break
+            if line.startswith("[progress]"):
+                progress = dict(item.split("=", 1) for item in line.split()[1:] if "=" in item)
+            elif line:
+                print(line)
+        if progress:
+            self.process_label.config(
+                text=f"{self.child_name}: frame {progress.get('frame', '?')}, "
+                     f"{progress.get('fps', '?')} fps, {progress.get('objects', '?')} objects",
+                foreground='blue')
+        
+        returncode = process.poll()
+        if returncode is None:
+            self.root.after(500, self.poll_child)
+        else:
+            self.on_child_finished(returncode)
+    
+    def on_child_finished(self, returncode):
+        """Update the UI once the child process has exited"""
+        name = self.child_name
+        stopped = self.child_stop_requested
+        self.child_process = None
+        self.stop_button.config(state='disabled')
+        self.update_status()
+        self.refresh_logs()
+        
+        if stopped:
+            self.process_label.config(text=f"{name} stopped", foreground='orange')
+        elif returncode == 0:
+            self.process_label.config(text=f"{name} finished", foreground='green')
+            if name == "Zone drawing":
+                messagebox.showinfo("Success", "Zone drawing completed!")
+        else:
+            self.process_label.config(text=f"{name} failed (exit code {returncode})", foreground='red')
+            messagebox.showerror("Error", f"{name} process failed with exit code {returncode}")
+    
+    def stop_child(self):
+        """Ask the running child process to stop, killing it if it doesn't"""
+        process = self.child_process
+        if process is None or process.poll() is not None:
+            return
+        self.child_stop_requested = True
+        self.process_label.config(text=f"Stopping {self.child_name}...", foreground='orange')
+        # SIGTERM lets test_yolo.py flush its logs and video before exiting
+        process.terminate()
+        self.root.after(5000, lambda: process.poll() is None and process.kill())
+    
+    def on_close(self):
+        """Stop any running child process and close the window"""
+        if self.child_process and self.child_process.poll() is None:
+            self.child_process.terminate()
+        self.root.destroy()
+    
     def draw_zones(self):
         """Open zone drawing interface"""
-        try:
-            subprocess.run([sys.executable, "draw_zones.py"], check=True)
-            self.update_status()
-            messagebox.showinfo("Success", "Zone drawing completed!")
-        except subprocess.CalledProcessError as e:
-            messagebox.showerror("Error", f"Failed to start zone drawing: {e}")
-        except FileNotFoundError:
-            messagebox.showerror("Error", "draw_zones.py not found!")
+        self.launch_child("draw_zones.py", "Zone drawing")
     
     def start_detection(self):
         """Start the detection process"""
@@ -250,13 +381,9 @@ class ZoneGuardApp:
             messagebox.showerror("Error", f"Video file not found: {video_file}")
             return
         
-        try:
-            subprocess.run([sys.executable, "test_yolo.py"], check=True)
-            self.refresh_logs()
-        except subprocess.CalledProcessError as e:
-            messagebox.showerror("Error", f"Detection process failed: {e}")
-        except FileNotFoundError:
-            messagebox.showerror("Error", "test_yolo.py not found!")
+        if self.launch_child("test_yolo.py", "Detection"):
+            # The new run rewrites the CSV log from the start
+            self.log_tail.reset()
     
     def view_logs(self):
         """Open logs file in default application"""
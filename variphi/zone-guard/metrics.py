@@ -0,0 +1,136 @@
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (seconds) of the inference latency histogram buckets
+INFERENCE_BUCKETS = (0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1.0, 2.5)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def escape_label(value):
+    """Escape a label value for the text exposition format"""
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in labels) + "}"
+
+class Histogram:
+    """Cumulative-bucket histogram; observe() is a bisect and three additions"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class PipelineMetrics:
+    """Health metrics of one detection loop in Prometheus text format.
+
+    The loop updates plain attributes (frames_processed, events, the
+    inference histogram) without locks; a scrape only reads them, so at
+    worst it sees a value one update old. Values owned by other components
+    (dropped frames, active tracks, queue depths) are registered with
+    add_callback() and read at scrape time.
+    """
+
+    def __init__(self, camera=""):
+        self.base_labels = (("camera", camera),) if camera else ()
+        self.frames_processed = 0
+        self.events = {}    # (zone, event): count
+        self.inference_seconds = Histogram(INFERENCE_BUCKETS)
+        self.callbacks = []  # (name, type, help, callback)
+
+    def record_event(self, zone, event):
+        key = (zone, event)
+        self.events[key] = self.events.get(key, 0) + 1
+
+    def add_callback(self, name, metric_type, help_text, callback):
+        """Expose a counter or gauge whose value comes from callback()"""
+        self.callbacks.append((name, metric_type, help_text, callback))
+
+    def render(self):
+        """All metrics in the text exposition format"""
+        labels = self.base_labels
+        lines = []
+
+        def header(name, metric_type, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+        header("zone_guard_frames_processed_total", "counter", "Frames processed by the detection loop")
+        lines.append(f"zone_guard_frames_processed_total{format_labels(labels)} {self.frames_processed}")
+
+        header("zone_guard_events_total", "counter", "Zone events logged, by zone and event type")
+        for (zone, event), count in sorted(self.events.items()):
+            event_labels = labels + (("zone", zone), ("event", event))
+            lines.append(f"zone_guard_events_total{format_labels(event_labels)} {count}")
+
+        histogram = self.inference_seconds
+        header("zone_guard_inference_seconds", "histogram", "Detector time per frame")
+        cumulative = 0
+        for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+            cumulative += count
+            lines.append(f"zone_guard_inference_seconds_bucket{format_labels(labels + (('le', bound),))} "
+                         f"{cumulative}")
+        lines.append(f"zone_guard_inference_seconds_sum{format_labels(labels)} {histogram.sum}")
+        lines.append(f"zone_guard_inference_seconds_count{format_labels(labels)} {histogram.count}")
+
+        for name, metric_type, help_text, callback in self.callbacks:
+            try:
+                value = callback()
+            except Exception:
+                continue
+            header(name, metric_type, help_text)
+            lines.append(f"{name}{format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class MetricsServer:
+    """Serve PipelineMetrics at http://host:port/metrics from a daemon thread.
+
+    Port 0 picks a free port; the chosen one is in .port after start().
+    """
+
+    def __init__(self, metrics, host="127.0.0.1", port=9108):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.httpd = None
+        self.server_thread = None
+
+    def start(self):
+        self.httpd = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.metrics = self.metrics
+        self.port = self.httpd.server_address[1]
+        self.server_thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.server_thread.start()
+        return self
+
+    def stop(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.server_thread.join()
+            self.httpd = None
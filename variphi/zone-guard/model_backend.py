@@ -0,0 +1,229 @@
+import os
+import json
+import argparse
+import numpy as np
+from collections import namedtuple
+from ultralytics import YOLO
+
+BACKENDS = ("pytorch", "onnx", "openvino")
+DEFAULT_IMGSZ = 640
+
+# Per-frame detector output as plain numpy arrays: boxes (N, 4) xyxy,
+# class_ids (N,) and confidences (N,). Cheap to pickle between processes.
+Detections = namedtuple("Detections", ["boxes", "class_ids", "confidences"])
+
+def detections_from_result(result):
+    """Convert an ultralytics Result into Detections"""
+    if result.boxes is None:
+        return Detections(np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32),
+                          np.zeros(0, dtype=np.float32))
+    return Detections(result.boxes.xyxy.cpu().numpy(), result.boxes.cls.cpu().numpy(),
+                      result.boxes.conf.cpu().numpy())
+
+def inference_size(imgsz=0, roi_box=None, width=0, height=0):
+    """YOLO input size; 0 means automatic.
+
+    The automatic size is DEFAULT_IMGSZ for full frames. For an ROI crop it
+    is scaled by crop / frame long side (rounded up to the model stride of
+    32), so the zones keep the resolution they have in a full-frame run
+    instead of the crop being upscaled to 640.
+    """
+    if imgsz:
+        return imgsz
+    if not roi_box or width <= 0 or height <= 0:
+        return DEFAULT_IMGSZ
+    x1, y1, x2, y2 = roi_box
+    scaled = DEFAULT_IMGSZ * max(x2 - x1, y2 - y1) / max(width, height)
+    return min(DEFAULT_IMGSZ, max(32, -(-int(scaled) // 32) * 32))
+
+def exported_model_path(model_path, backend, int8=False):
+    """Path of the cached export for a backend, next to the .pt file"""
+    stem = os.path.splitext(model_path)[0]
+    suffix = "_int8" if int8 else ""
+    if backend == "onnx":
+        return f"{stem}{suffix}.onnx"
+    if backend == "openvino":
+        return f"{stem}{suffix}_openvino_model"
+    return model_path
+
+def is_export_stale(model_path, export_path):
+    """True when the export is missing or older than the source weights"""
+    if not os.path.exists(export_path):
+        return True
+    return os.path.getmtime(export_path) < os.path.getmtime(model_path)
+
+def quantize_onnx(source_path, target_path):
+    """Write a dynamically INT8-quantized copy of an ONNX model"""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    quantize_dynamic(source_path, target_path, weight_type=QuantType.QUInt8)
+    return target_path
+
+def export_model(model_path, backend, int8=False, imgsz=640):
+    """Export the PyTorch weights to a CPU backend and return the artifact path"""
+    target_path = exported_model_path(model_path, backend, int8)
+    model = YOLO(model_path)
+    print(f"Exporting {model_path} to {backend}{' (INT8)' if int8 else ''}...")
+    if backend == "onnx":
+        # Dynamic axes keep batched inference and any imgsz working
+        onnx_path = model.export(format="onnx", dynamic=True, simplify=True, imgsz=imgsz)
+        if int8:
+            quantize_onnx(onnx_path, target_path)
+        elif os.path.abspath(onnx_path) != os.path.abspath(target_path):
+            os.replace(onnx_path, target_path)
+    elif backend == "openvino":
+        model.export(format="openvino", dynamic=True, int8=int8, imgsz=imgsz)
+    else:
+        raise ValueError(f"Unknown model backend: {backend}")
+    print(f"Cached exported model: {target_path}")
+    return target_path
+
+def load_model(model_path, backend="pytorch", int8=False, imgsz=640):
+    """Load YOLO for the configured backend, exporting it on first use"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown model backend: {backend} (expected one of {', '.join(BACKENDS)})")
+    if backend == "pytorch":
+        return YOLO(model_path)
+
+    export_path = exported_model_path(model_path, backend, int8)
+    if is_export_stale(model_path, export_path):
+        export_path = export_model(model_path, backend, int8, imgsz)
+    return YOLO(export_path, task="detect")
+
+# ----------------- Backend Comparison -----------------
+def box_iou(box_a, box_b):
+    """Intersection over union of two (x1, y1, x2, y2) boxes"""
+    ix1, iy1 = max(box_a[0], box_b[0]), max(box_a[1], box_b[1])
+    ix2, iy2 = min(box_a[2], box_b[2]), min(box_a[3], box_b[3])
+    inter = max(0.0, ix2 - ix1) * max(0.0, iy2 - iy1)
+    area_a = (box_a[2] - box_a[0]) * (box_a[3] - box_a[1])
+    area_b = (box_b[2] - box_b[0]) * (box_b[3] - box_b[1])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+def match_detections(reference, candidate, iou_threshold=0.5):
+    """Greedily pair same-class detections by IoU; returns [(ref_idx, cand_idx, iou)]"""
+    pairs = []
+    for i, (ref_box, ref_cls, _) in enumerate(reference):
+        for j, (cand_box, cand_cls, _) in enumerate(candidate):
+            if ref_cls == cand_cls:
+                iou = box_iou(ref_box, cand_box)
+                if iou >= iou_threshold:
+                    pairs.append((iou, i, j))
+    pairs.sort(reverse=True)
+    used_ref, used_cand, matches = set(), set(), []
+    for iou, i, j in pairs:
+        if i not in used_ref and j not in used_cand:
+            used_ref.add(i)
+            used_cand.add(j)
+            matches.append((i, j, iou))
+    return matches
+
+def compare_backends(model_path, backend, video_source, zones, frame_limit=100, int8=False,
+                     imgsz=640, classes=None, conf=0.5):
+    """Run PyTorch and the exported backend on the same frames and summarise differences.
+
+    Besides box agreement, each detection's centroid is resolved to a zone so
+    the report shows whether the faster backend would change zone events.
+    """
+    import cv2
+    from zone_mask import zone_polygon_arrays
+
+    polygons = zone_polygon_arrays(zones)
+
+    def zone_of(box):
+        cx, cy = int((box[0] + box[2]) // 2), int((box[1] + box[3]) // 2)
+        for idx, polygon_np in enumerate(polygons):
+            if cv2.pointPolygonTest(polygon_np, (cx, cy), False) >= 0:
+                return idx
+        return None
+
+    def detections(model, frame):
+        result = model.predict(source=frame, imgsz=imgsz, classes=classes, conf=conf,
+                               save=False, verbose=False)[0]
+        if result.boxes is None:
+            return []
+        return list(zip(result.boxes.xyxy.cpu().numpy().tolist(),
+                        result.boxes.cls.cpu().numpy().astype(int).tolist(),
+                        result.boxes.conf.cpu().numpy().tolist()))
+
+    reference_model = load_model(model_path, "pytorch")
+    candidate_model = load_model(model_path, backend, int8, imgsz)
+
+    stats = {"frames": 0, "reference_detections": 0, "candidate_detections": 0,
+             "matched": 0, "unmatched_reference": 0, "unmatched_candidate": 0,
+             "zone_mismatches": 0, "mean_iou": 0.0, "max_confidence_delta": 0.0}
+    iou_total = 0.0
+    cap = cv2.VideoCapture(video_source)
+    while stats["frames"] < frame_limit:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        stats["frames"] += 1
+        reference = detections(reference_model, frame)
+        candidate = detections(candidate_model, frame)
+        matches = match_detections(reference, candidate)
+
+        stats["reference_detections"] += len(reference)
+        stats["candidate_detections"] += len(candidate)
+        stats["matched"] += len(matches)
+        stats["unmatched_reference"] += len(reference) - len(matches)
+        stats["unmatched_candidate"] += len(candidate) - len(matches)
+        for i, j, iou in matches:
+            iou_total += iou
+            delta = abs(reference[i][2] - candidate[j][2])
+            stats["max_confidence_delta"] = max(stats["max_confidence_delta"], delta)
+            if zone_of(reference[i][0]) != zone_of(candidate[j][0]):
+                stats["zone_mismatches"] += 1
+        # Unmatched detections inside a zone could create or hide an event
+        matched_ref = {i for i, _, _ in matches}
+        matched_cand = {j for _, j, _ in matches}
+        stats["zone_mismatches"] += sum(1 for i, det in enumerate(reference)
+                                        if i not in matched_ref and zone_of(det[0]) is not None)
+        stats["zone_mismatches"] += sum(1 for j, det in enumerate(candidate)
+                                        if j not in matched_cand and zone_of(det[0]) is not None)
+    cap.release()
+
+    if stats["matched"]:
+        stats["mean_iou"] = iou_total / stats["matched"]
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the detector and compare it with PyTorch")
+    parser.add_argument("--backend", choices=BACKENDS[1:], default="onnx")
+    parser.add_argument("--int8", action="store_true", help="Use an INT8-quantized export")
+    parser.add_argument("--frames", type=int, default=100, help="Number of frames to compare")
+    parser.add_argument("--export-only", action="store_true", help="Only export and cache the model")
+    args = parser.parse_args()
+
+    try:
+        with open("config.json", "r") as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        config = {}
+    model_path = config.get("model_path", "yolov8n.pt")
+    imgsz = inference_size(config.get("inference_imgsz", 0))
+
+    if args.export_only:
+        export_model(model_path, args.backend, args.int8, imgsz)
+        return
+
+    zones_file = config.get("zones_file", "zones.json")
+    try:
+        with open(zones_file, "r") as f:
+            zones_data = json.load(f)
+        zones = zones_data.get("zones", []) if isinstance(zones_data, dict) else zones_data
+    except FileNotFoundError:
+        zones = []
+
+    stats = compare_backends(model_path, args.backend, config.get("video_source", "video2.mp4"), zones,
+                             frame_limit=args.frames, int8=args.int8, imgsz=imgsz,
+                             classes=sorted(config.get("detection_classes", {}).values()) or None,
+                             conf=config.get("confidence_threshold", 0.5))
+    print(json.dumps(stats, indent=4))
+    if stats["zone_mismatches"]:
+        print(f"WARNING: {stats['zone_mismatches']} detections resolve to a different zone")
+    else:
+        print("Zone assignments match the PyTorch backend")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import cv2
+import numpy as np
+
+class MotionGate:
+    """Decide per frame whether the detector needs to run.
+
+    Frames are downscaled to scale_width pixels wide, converted to blurred
+    grayscale and compared with the frame from the last detector run. When
+    the fraction of changed pixels inside (or within margin pixels of) any
+    zone stays below threshold, the frame is skipped. After max_skip
+    consecutive skips the detector is forced to run so tracks stay fresh.
+    """
+
+    def __init__(self, zones=None, threshold=0.002, max_skip=30, scale_width=160,
+                 pixel_threshold=25, margin=32):
+        self.zones = zones or []
+        self.threshold = threshold
+        self.max_skip = max_skip
+        self.scale_width = scale_width
+        self.pixel_threshold = pixel_threshold
+        self.margin = margin
+        self.scaled_size = None
+        self.region = None
+        self.region_pixels = 0
+        self.reference = None
+        self.consecutive_skips = 0
+        self.frames_checked = 0
+        self.frames_skipped = 0
+
+    def _setup(self, frame):
+        """Size the downscaled frame and zone region from the first frame"""
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.scale_width / float(width))
+        self.scaled_size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+        if self.zones:
+            region = np.zeros((self.scaled_size[1], self.scaled_size[0]), dtype=np.uint8)
+            polygons = [np.round(np.array(poly, dtype=np.float64) * scale).astype(np.int32).reshape((-1, 1, 2))
+                        for poly in self.zones if poly]
+            cv2.fillPoly(region, polygons, 1)
+            radius = int(round(self.margin * scale))
+            if radius > 0:
+                kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * radius + 1, 2 * radius + 1))
+                region = cv2.dilate(region, kernel)
+            self.region = region.astype(bool)
+            self.region_pixels = int(np.count_nonzero(self.region))
+        else:
+            self.region_pixels = self.scaled_size[0] * self.scaled_size[1]
+
+    def _prepare(self, frame):
+        """Downscaled, blurred grayscale copy of the frame"""
+        small = cv2.resize(frame, self.scaled_size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def motion_fraction(self, gray):
+        """Fraction of region pixels that changed since the reference frame"""
+        changed = cv2.absdiff(gray, self.reference) > self.pixel_threshold
+        if self.region is not None:
+            changed &= self.region
+        return np.count_nonzero(changed) / float(max(1, self.region_pixels))
+
+    def should_detect(self, frame):
+        """Return True when the detector should run on this frame"""
+        if self.scaled_size is None:
+            self._setup(frame)
+        self.frames_checked += 1
+        gray = self._prepare(frame)
+
+        run = (self.reference is None
+               or self.consecutive_skips >= self.max_skip
+               or self.motion_fraction(gray) >= self.threshold)
+        if run:
+            self.reference = gray
+            self.consecutive_skips = 0
+        else:
+            self.consecutive_skips += 1
+            self.frames_skipped += 1
+        return run
@@ -0,0 +1,95 @@
+import time
+from collections import deque
+import numpy as np
+
+class _Measurement:
+    """Context manager recording the time spent in its block"""
+
+    __slots__ = ("timer", "stage", "start")
+
+    def __init__(self, timer, stage):
+        self.timer = timer
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.timer.record(self.stage, time.perf_counter() - self.start)
+        return False
+
+class _NoMeasurement:
+    """Shared do-nothing context manager for a disabled timer"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NO_MEASUREMENT = _NoMeasurement()
+
+class StageTimer:
+    """Rolling per-stage latency statistics.
+
+    Each stage keeps the last window samples in a deque, so recording is an
+    append; percentiles are only computed when a summary or the overlay asks
+    for them. Stages appear in the order they were first recorded.
+
+        with timer.measure("inference"):
+            results = model.predict(...)
+    """
+
+    def __init__(self, window=1000, enabled=True):
+        self.window = window
+        self.enabled = enabled
+        self.samples = {}
+        self.totals = {}
+        self.counts = {}
+
+    def measure(self, stage):
+        """Context manager timing one pass through a stage"""
+        if not self.enabled:
+            return _NO_MEASUREMENT
+        return _Measurement(self, stage)
+
+    def record(self, stage, seconds):
+        """Add one sample (in seconds) for a stage"""
+        if not self.enabled:
+            return
+        samples = self.samples.get(stage)
+        if samples is None:
+            samples = self.samples[stage] = deque(maxlen=self.window)
+            self.totals[stage] = 0.0
+            self.counts[stage] = 0
+        samples.append(seconds)
+        self.totals[stage] += seconds
+        self.counts[stage] += 1
+
+    def stage_stats(self, stage):
+        """count, mean and rolling p50/p95/p99 for a stage, in milliseconds"""
+        samples = np.fromiter(self.samples[stage], dtype=np.float64) * 1000.0
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        return {
+            "count": self.counts[stage],
+            "mean_ms": round(self.totals[stage] * 1000.0 / self.counts[stage], 3),
+            "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3),
+            "p99_ms": round(float(p99), 3),
+        }
+
+    def summary(self):
+        """Stats for every recorded stage"""
+        return {stage: self.stage_stats(stage) for stage in self.samples}
+
+    def overlay_lines(self):
+        """Short 'stage p50/p95 ms' strings for drawing on a frame"""
+        lines = []
+        for stage in self.samples:
+            samples = np.fromiter(self.samples[stage], dtype=np.float64) * 1000.0
+            p50, p95 = np.percentile(samples, [50, 95])
+            lines.append(f"{stage}: {p50:.1f}/{p95:.1f} ms")
+        return lines
@@ -0,0 +1,274 @@
+import os
+import sys
+import time
+import queue
+import signal
+import argparse
+import multiprocessing as mp
+
+class QueueEventSink:
+    """Event sink used inside camera workers: rows go to the supervisor's queue"""
+
+    def __init__(self, event_queue):
+        self.event_queue = event_queue
+
+    def write(self, row):
+        self.event_queue.put(list(row))
+
+    def close(self):
+        pass
+
+# Output files each camera writes itself; unless a camera sets its own path,
+# the camera name is appended so workers don't overwrite each other
+PER_CAMERA_FILES = ("video_output", "summary_file")
+
+def camera_configs(config):
+    """One full config per entry of config["cameras"].
+
+    Each camera entry overrides the shared settings, so only video_source,
+    zones_file and whatever differs per camera need to be listed. Without a
+    cameras list the single video_source becomes one camera.
+    """
+    cameras = config.get("cameras") or [{"name": "camera1"}]
+    resolved = []
+    for idx, camera in enumerate(cameras):
+        camera_config = {key: value for key, value in config.items() if key != "cameras"}
+        camera_config.update(camera)
+        camera_config["name"] = str(camera.get("name") or f"camera{idx + 1}")
+        # Each worker serves its own /metrics on consecutive ports
+        if "metrics_port" not in camera and camera_config.get("metrics_enabled"):
+            camera_config["metrics_port"] = config.get("metrics_port", 9108) + idx
+        for key in PER_CAMERA_FILES:
+            if key not in camera and camera_config.get(key):
+                root, ext = os.path.splitext(camera_config[key])
+                camera_config[key] = f"{root}_{camera_config['name']}{ext}"
+        # Workers never open a preview window
+        camera_config["headless"] = True
+        resolved.append(camera_config)
+    names = [camera["name"] for camera in resolved]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Camera names must be unique: {names}")
+    return resolved
+
+def pin_to_cpu(cpu):
+    """Restrict the current process to one CPU where the OS supports it"""
+    if cpu is None or not hasattr(os, "sched_setaffinity"):
+        return False
+    os.sched_setaffinity(0, {cpu})
+    return True
+
+def run_camera_worker(camera_config, event_queue, cpu=None, inference=None):
+    """Worker process entry point: run one DetectionPipeline to the end"""
+    # The supervisor handles Ctrl-C and stops workers with SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+    if pin_to_cpu(cpu):
+        # One inference thread per pinned core avoids oversubscription
+        import torch
+        torch.set_num_threads(1)
+
+    from alert_system import ConsoleAlertSystem
+    from test_yolo import DetectionPipeline, load_zones
+
+    name = camera_config["name"]
+    detector = None
+    if inference is not None:
+        from inference_server import InferenceClient
+        detector = InferenceClient(inference, slot_count=camera_config["inference_batch_size"])
+    zones, zone_labels = load_zones(camera_config["zones_file"])
+    alerts = ConsoleAlertSystem(camera=name)
+    pipeline = DetectionPipeline(camera_config, zones, zone_labels, event_sink=QueueEventSink(event_queue),
+                                 camera_name=name, alerts=alerts, detector=detector)
+    try:
+        summary = pipeline.run()
+    except RuntimeError as e:
+        print(f"[{name}] Error: {e}", flush=True)
+        sys.exit(1)
+    finally:
+        if detector is not None:
+            detector.close()
+        alerts.cleanup()
+    print(f"[{name}] Finished: {summary}", flush=True)
+
+class CameraWorker:
+    """Bookkeeping for one camera's worker process"""
+
+    def __init__(self, camera_config, cpu):
+        self.camera_config = camera_config
+        self.name = camera_config["name"]
+        self.cpu = cpu
+        self.process = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.restart_delay = 0.0
+        self.restart_at = None
+        self.finished = False
+
+class CameraSupervisor:
+    """Run one detection worker process per camera and merge their events.
+
+    Workers are started with the spawn method, optionally pinned to a core
+    each, and send event rows over a shared queue; the supervisor writes
+    them to a single event sink. A worker that exits with a non-zero code
+    (crash, lost stream) is restarted after restart_delay seconds, doubling
+    up to max_restart_delay while it keeps failing quickly. A worker that
+    exits cleanly (end of a video file) is not restarted. run() returns when
+    every worker has finished or stop() is called.
+
+    With an inference_server, workers send frames to that one shared model
+    process instead of each loading their own; it is restarted if it dies.
+    """
+
+    def __init__(self, cameras, event_sink, pin_cpus=True, restart_delay=1.0, max_restart_delay=30.0,
+                 stable_seconds=60.0, worker_target=run_camera_worker, inference_server=None):
+        self.event_sink = event_sink
+        self.inference_server = inference_server
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.stable_seconds = stable_seconds
+        self.worker_target = worker_target
+        self.context = mp.get_context("spawn")
+        self.event_queue = self.context.Queue()
+        self.events_received = 0
+        self.stopping = False
+
+        cpus = sorted(os.sched_getaffinity(0)) if pin_cpus and hasattr(os, "sched_getaffinity") else []
+        self.workers = []
+        for idx, camera in enumerate(cameras):
+            cpu = camera.get("cpu", cpus[idx % len(cpus)] if cpus else None)
+            self.workers.append(CameraWorker(camera, cpu))
+
+    def start_worker(self, worker):
+        inference = self.inference_server.client_handle(worker.name) if self.inference_server else None
+        worker.process = self.context.Process(
+            target=self.worker_target, args=(worker.camera_config, self.event_queue, worker.cpu, inference),
+            name=f"zone-guard-{worker.name}", daemon=True)
+        worker.process.start()
+        worker.started_at = time.monotonic()
+        worker.restart_at = None
+        cpu_note = f" on CPU {worker.cpu}" if worker.cpu is not None else ""
+        print(f"Started worker '{worker.name}' (pid {worker.process.pid}){cpu_note}", flush=True)
+
+    def check_worker(self, worker, now):
+        """Restart a crashed worker once its backoff delay has passed"""
+        if worker.finished:
+            return
+        if worker.restart_at is not None:
+            if now >= worker.restart_at:
+                worker.restarts += 1
+                self.start_worker(worker)
+            return
+        exitcode = worker.process.exitcode
+        if exitcode is None:
+            return
+        worker.process.join()
+        if exitcode == 0 or self.stopping:
+            worker.finished = True
+            print(f"Worker '{worker.name}' finished", flush=True)
+            return
+        # Back off while the worker keeps failing soon after starting
+        if now - worker.started_at >= self.stable_seconds:
+            worker.restart_delay = self.restart_delay
+        else:
+            worker.restart_delay = min(self.max_restart_delay, max(self.restart_delay, worker.restart_delay * 2))
+        worker.restart_at = now + worker.restart_delay
+        print(f"Worker '{worker.name}' exited with code {exitcode}, "
+              f"restarting in {worker.restart_delay:.1f}s", flush=True)
+
+    def drain_events(self, timeout=0.5):
+        """Move queued rows into the event sink"""
+        try:
+            row = self.event_queue.get(timeout=timeout)
+        except queue.Empty:
+            return
+        while True:
+            self.event_sink.write(row)
+            self.events_received += 1
+            try:
+                row = self.event_queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def check_inference_server(self):
+        """Restart the shared inference server if it died"""
+        server = self.inference_server
+        if server is None or self.stopping or server.process.exitcode is None:
+            return
+        print(f"Inference server exited with code {server.process.exitcode}, restarting", flush=True)
+        server.process.join()
+        server.start()
+
+    def run(self):
+        if self.inference_server:
+            self.inference_server.start()
+        for worker in self.workers:
+            self.start_worker(worker)
+        try:
+            while not all(worker.finished for worker in self.workers):
+                self.drain_events()
+                self.check_inference_server()
+                now = time.monotonic()
+                for worker in self.workers:
+                    self.check_worker(worker, now)
+        finally:
+            self.stop()
+            self.drain_events(timeout=0)
+        return {worker.name: {"restarts": worker.restarts} for worker in self.workers}
+
+    def stop(self, timeout=10.0):
+        """Terminate running workers; they flush their last rows on SIGTERM"""
+        self.stopping = True
+        running = [worker for worker in self.workers
+                   if worker.process is not None and worker.process.exitcode is None]
+        for worker in running:
+            worker.process.terminate()
+        deadline = time.monotonic() + timeout
+        for worker in running:
+            while worker.process.exitcode is None and time.monotonic() < deadline:
+                # Keep draining so a worker blocked on a full queue can exit
+                self.drain_events(timeout=0.1)
+            if worker.process.exitcode is None:
+                worker.process.kill()
+            worker.process.join()
+            worker.finished = True
+        if self.inference_server:
+            self.inference_server.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Zone Guard detection on several cameras")
+    parser.add_argument("--config", default="config.json", help="Config file with a 'cameras' list")
+    parser.add_argument("--no-pin", action="store_true", help="Do not pin workers to CPU cores")
+    args = parser.parse_args()
+
+    from test_yolo import load_config
+    from event_log import create_event_sink
+    from inference_server import InferenceServer, server_settings
+
+    config = load_config(args.config)
+    cameras = camera_configs(config)
+    print(f"Supervising {len(cameras)} cameras: {[camera['name'] for camera in cameras]}")
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+    event_sink = create_event_sink(config["log_backend"], config["log_file"], config["events_db"],
+                                   config["log_batch_size"], config["log_flush_interval"], config["log_fsync"])
+    inference_server = None
+    if config.get("inference_server"):
+        inference_server = InferenceServer(server_settings(cameras), [camera["name"] for camera in cameras],
+                                           config.get("inference_server_batch_size", 8),
+                                           config.get("inference_server_max_wait_ms", 10) / 1000.0)
+    supervisor = CameraSupervisor(cameras, event_sink, pin_cpus=not args.no_pin,
+                                  inference_server=inference_server)
+    try:
+        restarts = supervisor.run()
+    except KeyboardInterrupt:
+        print("\nInterrupted, stopping workers...")
+        restarts = {worker.name: {"restarts": worker.restarts} for worker in supervisor.workers}
+    finally:
+        event_sink.close()
+
+    print(f"\nAll workers stopped. Events logged: {supervisor.events_received}")
+    for name, stats in restarts.items():
+        print(f"  {name}: {stats['restarts']} restarts")
+
+if __name__ == "__main__":
+    main()
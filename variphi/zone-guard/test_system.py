@@ -2,9 +2,14 @@ import unittest
 import json
 import os
 import sys
+import time
+import tempfile
+import threading
+import socketserver
 import cv2
 import numpy as np
 from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 class TestZoneGuard(unittest.TestCase):
     """Test suite for Zone Guard system components"""
@@ -187,6 +192,996 @@ class TestZoneGuard(unittest.TestCase):
         except Exception as e:
             self.fail(f"Could not test test_yolo.py: {e}")
 
+class FakeCapture:
+    """Minimal stand-in for cv2.VideoCapture yielding numbered frames"""
+    
+    def __init__(self, frame_count):
+        self.frame_count = frame_count
+        self.position = 0
+    
+    def read(self, image=None):
+        if self.position >= self.frame_count:
+            return False, None
+        self.position += 1
+        if image is not None:
+            image[...] = self.position
+            return True, image
+        return True, np.full((2, 2), self.position, dtype=np.uint8)
+
+class TestFrameGrabber(unittest.TestCase):
+    """Test the threaded capture stage"""
+    
+    def test_block_policy_keeps_every_frame(self):
+        """Block policy should deliver all frames in order"""
+        from video_io import FrameGrabber
+        grabber = FrameGrabber(FakeCapture(50), queue_size=2, policy="block").start()
+        values = []
+        while True:
+            ret, frame = grabber.read()
+            if not ret:
+                break
+            values.append(int(frame[0, 0]))
+        grabber.stop()
+        self.assertEqual(values, list(range(1, 51)))
+        self.assertEqual(grabber.frames_dropped, 0)
+    
+    def test_drop_oldest_policy_keeps_freshest_frames(self):
+        """Drop-oldest policy should discard stale frames when the consumer lags"""
+        from video_io import FrameGrabber
+        grabber = FrameGrabber(FakeCapture(50), queue_size=2, policy="drop_oldest").start()
+        grabber.capture_thread.join(timeout=2.0)
+        values = []
+        while True:
+            ret, frame = grabber.read()
+            if not ret:
+                break
+            values.append(int(frame[0, 0]))
+        self.assertEqual(values, [50])
+        self.assertEqual(grabber.frames_dropped, 49)
+    
+    def test_live_source_detection(self):
+        """Camera indexes and stream URLs should be treated as live"""
+        from video_io import is_live_source
+        self.assertTrue(is_live_source(0))
+        self.assertTrue(is_live_source("rtsp://camera/stream"))
+        self.assertFalse(is_live_source("video2.mp4"))
+
+class TestSharedFrameRing(unittest.TestCase):
+    """Test the shared memory frame ring"""
+    
+    def test_slots_are_reference_counted(self):
+        """A slot is reused only after every user released it"""
+        from video_io import SharedFrameRing
+        ring = SharedFrameRing(1, 4, 4)
+        slot = ring.acquire()
+        frame = ring.frames[slot]
+        self.assertEqual(ring.slot_of(frame), slot)
+        self.assertIsNone(ring.slot_of(frame[1:]))
+        self.assertIsNone(ring.slot_of(frame.copy()))
+        ring.retain(frame)
+        ring.release(frame)
+        self.assertIsNone(ring.acquire(timeout=0.01))
+        ring.release(frame)
+        self.assertEqual(ring.acquire(timeout=0.01), slot)
+        del frame
+        ring.close()
+    
+    def test_grabber_decodes_into_ring(self):
+        """Frames are decoded in place into ring slots and recycled after release"""
+        from video_io import FrameGrabber, SharedFrameRing
+        ring = SharedFrameRing(3, 2, 2)
+        grabber = FrameGrabber(FakeCapture(50), queue_size=2, frame_ring=ring).start()
+        values = []
+        while True:
+            ret, frame = grabber.read()
+            if not ret:
+                break
+            self.assertIsNotNone(ring.slot_of(frame))
+            values.append(int(frame[0, 0, 0]))
+            grabber.release(frame)
+        grabber.stop()
+        del frame
+        self.assertEqual(values, list(range(1, 51)))
+        self.assertEqual(ring.free_slots.qsize(), 3)
+        ring.close()
+
+class TestAsyncVideoWriter(unittest.TestCase):
+    """Test the background video writer"""
+    
+    def test_release_flushes_all_frames_in_order(self):
+        """Every queued frame reaches the underlying writer before release"""
+        from video_io import AsyncVideoWriter
+        
+        class SlowWriter:
+            def __init__(self):
+                self.frames = []
+                self.released = False
+            def write(self, frame):
+                time.sleep(0.001)
+                self.frames.append(int(frame[0, 0]))
+            def release(self):
+                self.released = True
+        
+        target = SlowWriter()
+        writer = AsyncVideoWriter(target, queue_size=4)
+        for i in range(40):
+            writer.write(np.full((2, 2), i, dtype=np.uint8))
+        writer.release()
+        self.assertEqual(target.frames, list(range(40)))
+        self.assertTrue(target.released)
+        self.assertEqual(writer.stats()["frames_written"], 40)
+        self.assertLessEqual(writer.stats()["max_queue_depth"], 4)
+
+class TestFrameRingBuffer(unittest.TestCase):
+    """Test the preallocated pre-roll ring buffer"""
+    
+    def test_keeps_last_frames_oldest_first(self):
+        """Only the newest capacity frames are kept, in order"""
+        from video_io import FrameRingBuffer
+        ring = FrameRingBuffer(3, 2, 2)
+        storage = ring.frames
+        for i in range(5):
+            ring.push(np.full((2, 2, 3), i, dtype=np.uint8))
+        self.assertEqual([int(f[0, 0, 0]) for f in ring.ordered()], [2, 3, 4])
+        self.assertIs(ring.frames, storage)
+
+class TestClipRecorder(unittest.TestCase):
+    """Test event clip recording"""
+    
+    def test_clip_has_pre_and_post_roll_and_closes_in_background(self):
+        """The pre-roll survives later frames and close() waits for the background closer"""
+        from video_io import ClipRecorder
+        
+        def frame(value):
+            return np.full((48, 64, 3), value, dtype=np.uint8)
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            recorder = ClipRecorder(64, 48, 10, temp_dir, pre_roll_seconds=1.0, post_roll_seconds=0.5,
+                                    queue_size=2)
+            for i in range(15):
+                recorder.add_frame(frame(i * 10))
+            path = recorder.trigger("obj1_zone1")
+            self.assertGreaterEqual(recorder.writer.frame_queue.maxsize, 10)
+            for i in range(5):
+                recorder.add_frame(frame(200))
+            self.assertIsNone(recorder.writer)
+            # Next pre-roll must not overwrite the frames of the clip being encoded
+            for i in range(10):
+                recorder.add_frame(frame(255))
+            recorder.close()
+            self.assertEqual(recorder.clips_written, 1)
+            self.assertEqual(recorder.closers, [])
+            
+            cap = cv2.VideoCapture(path)
+            values = []
+            while True:
+                ret, image = cap.read()
+                if not ret:
+                    break
+                values.append(float(image.mean()))
+            cap.release()
+        self.assertEqual(len(values), 15)
+        self.assertAlmostEqual(values[0], 50, delta=8)
+        self.assertAlmostEqual(values[9], 140, delta=8)
+        self.assertAlmostEqual(values[-1], 200, delta=8)
+    
+    def test_pre_roll_rings_are_reused(self):
+        """Clips swap between the two preallocated rings and skip the pre-roll while both are in use"""
+        from types import SimpleNamespace
+        from video_io import ClipRecorder
+        frame = np.zeros((48, 64, 3), dtype=np.uint8)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            recorder = ClipRecorder(64, 48, 10, temp_dir, pre_roll_seconds=0.5, post_roll_seconds=0.2)
+            arrays = [ring.frames for ring in recorder.rings]
+            for _ in range(3):
+                for _ in range(5):
+                    recorder.add_frame(frame)
+                recorder.trigger("obj")
+                for _ in range(2):
+                    recorder.add_frame(frame)
+                recorder.close()
+            self.assertTrue(all(ring.frames is array for ring, array in zip(recorder.rings, arrays)))
+            self.assertEqual(recorder.pre_rolls_skipped, 0)
+            
+            # An encoder still reading the next ring: its frames are neither overwritten nor reused
+            recorder.ring_readers[recorder.ring_index] = (SimpleNamespace(frames_written=0), 5)
+            for _ in range(5):
+                recorder.add_frame(frame)
+            self.assertEqual(recorder.rings[recorder.ring_index].count, 0)
+            recorder.trigger("obj")
+            self.assertEqual(recorder.pre_rolls_skipped, 1)
+            self.assertEqual(recorder.writer.frames_queued, 0)
+            recorder.close()
+        self.assertEqual(recorder.clips_written, 4)
+
+class TestCsvEventSink(unittest.TestCase):
+    """Test the buffered CSV event sink"""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "events.csv")
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    def read_rows(self):
+        with open(self.path, "r") as f:
+            return f.read().splitlines()
+    
+    def test_flushes_on_batch_size(self):
+        """A full batch is written without waiting for the interval"""
+        from event_log import CsvEventSink
+        sink = CsvEventSink(self.path, batch_size=2, flush_interval=60)
+        sink.write(["2025-01-01 00:00:00", 1, "Zone 1", "Entered", "person", 0.9, ""])
+        sink.write(["2025-01-01 00:00:01", 1, "Zone 1", "Exited", "person", 0.9, ""])
+        deadline = time.time() + 2
+        while sink.rows_written < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(self.read_rows()), 3)
+        sink.close()
+    
+    def test_flushes_on_interval(self):
+        """A partial batch is written once the flush interval passes"""
+        from event_log import CsvEventSink
+        sink = CsvEventSink(self.path, batch_size=100, flush_interval=0.05)
+        sink.write(["2025-01-01 00:00:00", 1, "Zone 1", "Entered", "person", 0.9, ""])
+        time.sleep(0.5)
+        self.assertEqual(sink.rows_written, 1)
+        sink.close()
+    
+    def test_close_writes_pending_rows(self):
+        """close() flushes queued rows and can be called twice"""
+        from event_log import CsvEventSink, LOG_COLUMNS
+        sink = CsvEventSink(self.path, batch_size=100, flush_interval=60, fsync_policy="batch")
+        for i in range(10):
+            sink.write(["2025-01-01 00:00:00", i, "Zone 1", "Entered", "person", 0.9, ""])
+        sink.close()
+        sink.close()
+        rows = self.read_rows()
+        self.assertEqual(rows[0], ",".join(LOG_COLUMNS))
+        self.assertEqual(len(rows), 11)
+    
+    def test_storage_errors_never_block(self):
+        """A failing store is recorded; write() and close() drop rows instead of hanging"""
+        from event_log import CsvEventSink
+        sink = CsvEventSink(self.path, batch_size=1, flush_interval=60, queue_size=2, close_timeout=2.0)
+        
+        def fail(rows):
+            raise OSError(28, "No space left on device")
+        sink._store_rows = fail
+        start = time.time()
+        for i in range(100):
+            sink.write(["2025-01-01 00:00:00", i, "Zone 1", "Entered", "person", 0.9, ""])
+        sink.close()
+        self.assertLess(time.time() - start, 5.0)
+        self.assertFalse(sink.writer_thread.is_alive())
+        self.assertIsInstance(sink.error, OSError)
+        self.assertEqual(sink.rows_written, 0)
+        self.assertEqual(sink.rows_dropped, 100)
+        
+        # A writer that died outright no longer accepts (or waits for) rows
+        sink.writer_thread = threading.Thread(target=lambda: None)
+        sink.writer_thread.start()
+        sink.writer_thread.join()
+        sink.write(["2025-01-01 00:00:00", 101, "Zone 1", "Entered", "person", 0.9, ""])
+        self.assertEqual(sink.rows_dropped, 101)
+
+class TestCsvTailReader(unittest.TestCase):
+    """Test incremental reading of the CSV log"""
+    
+    def test_reads_appended_rows_and_handles_truncation(self):
+        """Only new complete lines are returned; truncation resets the reader"""
+        from event_log import CsvTailReader
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "logs.csv")
+            reader = CsvTailReader(path)
+            self.assertEqual(reader.read(), (False, []))
+            
+            with open(path, "w", newline="") as f:
+                f.write("Timestamp,ObjectID,Zone,Event\r\n2025-08-28 21:59:23,1,2,Entered\r\n")
+            reset, rows = reader.read()
+            self.assertTrue(reset)
+            self.assertEqual(rows, [{"Timestamp": "2025-08-28 21:59:23", "ObjectID": "1",
+                                     "Zone": "2", "Event": "Entered"}])
+            
+            with open(path, "a", newline="") as f:
+                f.write("2025-08-28 21:59:24,1,2,Exited\r\n2025-08-28 21:59:25,2,")
+            reset, rows = reader.read()
+            self.assertFalse(reset)
+            self.assertEqual([row["Event"] for row in rows], ["Exited"])
+            
+            with open(path, "a", newline="") as f:
+                f.write("1,Entered\r\n")
+            self.assertEqual(reader.read()[1][0]["ObjectID"], "2")
+            self.assertEqual(reader.read(), (False, []))
+            
+            with open(path, "w", newline="") as f:
+                f.write("Timestamp,ObjectID,Zone,Event\r\n")
+            self.assertEqual(reader.read(), (True, []))
+    
+    def test_rewrite_grown_past_old_offset_resets(self):
+        """A log reopened with "w" that is already longer than the old offset starts over"""
+        from event_log import CsvTailReader
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "logs.csv")
+            with open(path, "w", newline="") as f:
+                f.write("Timestamp,ObjectID,Zone,Event\r\n2025-08-28 21:59:23,1,2,Entered\r\n")
+            reader = CsvTailReader(path)
+            self.assertEqual(len(reader.read()[1]), 1)
+            
+            # Same inode, truncated and regrown before the next read
+            with open(path, "w", newline="") as f:
+                f.write("Timestamp,ObjectID,Zone,Event\r\n")
+                for i in range(3):
+                    f.write(f"2025-08-29 08:00:0{i},{i + 10},1,Entered\r\n")
+            reset, rows = reader.read()
+            self.assertTrue(reset)
+            self.assertEqual([row["ObjectID"] for row in rows], ["10", "11", "12"])
+            self.assertEqual(reader.read(), (False, []))
+            
+            reader.reset()
+            reset, rows = reader.read()
+            self.assertTrue(reset)
+            self.assertEqual(len(rows), 3)
+    
+    def test_first_read_of_large_file_starts_at_tail(self):
+        """A large existing log is not parsed from the beginning"""
+        from event_log import CsvTailReader
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "logs.csv")
+            with open(path, "w", newline="") as f:
+                f.write("Timestamp,ObjectID,Zone,Event\r\n")
+                for i in range(1000):
+                    f.write(f"2025-08-28 21:59:23,{i},2,Entered\r\n")
+            reader = CsvTailReader(path, initial_bytes=1024)
+            reset, rows = reader.read()
+            self.assertTrue(reset)
+            self.assertLess(len(rows), 100)
+            self.assertEqual(rows[-1]["ObjectID"], "999")
+            with open(path, "a", newline="") as f:
+                f.write("2025-08-28 21:59:24,1000,2,Exited\r\n")
+            self.assertEqual(reader.read(), (False, [{"Timestamp": "2025-08-28 21:59:24", "ObjectID": "1000",
+                                                      "Zone": "2", "Event": "Exited"}]))
+
+class TestSqliteEventSink(unittest.TestCase):
+    """Test the SQLite event store"""
+    
+    def test_batched_inserts_and_queries(self):
+        """Rows land in the indexed table and can be queried by zone and time"""
+        from event_log import SqliteEventSink, recent_events, query_events
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "events.db")
+            sink = SqliteEventSink(path, batch_size=10, flush_interval=60)
+            for i in range(30):
+                zone = "2" if i % 3 == 0 else "1"
+                sink.write([f"2025-08-28 21:{i:02d}:00", i, zone, "Entered", "person",
+                            np.float32(0.75), "", i * 10])
+            sink.close()
+            
+            newest = recent_events(path, limit=5)
+            self.assertEqual([row["ObjectID"] for row in newest], [25, 26, 27, 28, 29])
+            self.assertAlmostEqual(newest[0]["Confidence"], 0.75)
+            zone_two = query_events(path, zone=2, event="Entered", since="2025-08-28 21:10:00")
+            self.assertEqual([row["ObjectID"] for row in zone_two], [12, 15, 18, 21, 24, 27])
+
+class TestCentroidTracker(unittest.TestCase):
+    """Test the vectorized centroid tracker"""
+    
+    def test_ids_persist_within_threshold(self):
+        """Objects that move less than the threshold keep their IDs"""
+        from tracker import CentroidTracker
+        tracker = CentroidTracker(distance_threshold=50)
+        first = tracker.update([(100, 100), (400, 400)], ["person", "car"], [0.9, 0.8])
+        second = tracker.update([(405, 402), (110, 95)], ["car", "person"], [0.8, 0.9])
+        self.assertEqual(set(first), {1, 2})
+        self.assertEqual(second, {2: (405, 402), 1: (110, 95)})
+        self.assertEqual(tracker.classes, {2: "car", 1: "person"})
+    
+    def test_far_detection_starts_new_track(self):
+        """Detections beyond the threshold get a new ID"""
+        from tracker import CentroidTracker
+        tracker = CentroidTracker(distance_threshold=50)
+        tracker.update([(100, 100)], ["person"], [0.9])
+        updated = tracker.update([(300, 300)], ["person"], [0.9])
+        self.assertEqual(list(updated), [2])
+        self.assertEqual(tracker.object_id_count, 2)
+    
+    def test_no_two_detections_claim_one_track(self):
+        """Assignment is one-to-one and minimises total distance"""
+        from tracker import CentroidTracker, greedy_assignment
+        tracker = CentroidTracker(distance_threshold=50)
+        tracker.update([(100, 100), (130, 100)], ["person", "person"], [0.9, 0.9])
+        # First detection is within range of both tracks; greedy first-match
+        # would steal track 1 from the detection that sits right on top of it
+        updated = tracker.update([(118, 100), (100, 100)], ["person", "person"], [0.9, 0.9])
+        self.assertEqual(updated, {2: (118, 100), 1: (100, 100)})
+        
+        rows, cols = greedy_assignment(np.array([[1.0, 2.0], [0.5, 3.0]]))
+        self.assertEqual(sorted(zip(rows.tolist(), cols.tolist())), [(0, 1), (1, 0)])
+
+class TestZoneMask(unittest.TestCase):
+    """Test the rasterized zone lookup"""
+    
+    def setUp(self):
+        self.zones = [
+            [[10, 10], [60, 10], [60, 60], [10, 60]],
+            [[40, 40], [90, 40], [90, 90], [40, 90]],
+        ]
+    
+    def test_matches_point_polygon_test(self):
+        """Mask lookup agrees with pointPolygonTest away from polygon edges"""
+        from zone_mask import ZoneMask, NO_ZONE, zone_polygon_arrays
+        mask = ZoneMask(self.zones, 100, 100)
+        polygons = zone_polygon_arrays(self.zones)
+        points = [(x, y) for x in range(0, 100, 7) for y in range(0, 100, 7)]
+        expected = []
+        for x, y in points:
+            match = NO_ZONE
+            for idx, polygon in enumerate(polygons):
+                if cv2.pointPolygonTest(polygon, (x, y), False) >= 0:
+                    match = idx
+                    break
+            expected.append(match)
+        self.assertEqual(mask.lookup(points).tolist(), expected)
+    
+    def test_first_zone_wins_and_bitmask_reports_overlap(self):
+        """Overlaps resolve to the first zone; the bitmask lists both"""
+        from zone_mask import ZoneMask, NO_ZONE, zones_from_bits
+        mask = ZoneMask(self.zones, 100, 100, with_bitmask=True)
+        self.assertEqual(mask.zone_index(50, 50), 0)
+        self.assertEqual(mask.zone_index(80, 80), 1)
+        self.assertIsNone(mask.zone_index(5, 95))
+        self.assertEqual(mask.lookup([(500, 500)]).tolist(), [NO_ZONE])
+        bits = mask.lookup_bits([(50, 50), (80, 80), (5, 95)])
+        self.assertEqual([zones_from_bits(b) for b in bits], [[0, 1], [1], []])
+
+class TestMotionGate(unittest.TestCase):
+    """Test motion-gated inference decisions"""
+    
+    def test_static_frames_are_skipped_until_max_skip(self):
+        """Identical frames are skipped, but never more than max_skip in a row"""
+        from motion import MotionGate
+        gate = MotionGate(threshold=0.01, max_skip=3)
+        frame = np.zeros((120, 160, 3), dtype=np.uint8)
+        decisions = [gate.should_detect(frame) for _ in range(9)]
+        self.assertEqual(decisions, [True, False, False, False, True, False, False, False, True])
+        self.assertEqual(gate.frames_skipped, 6)
+    
+    def test_motion_only_counts_near_zones(self):
+        """Changes far from every zone do not trigger detection"""
+        from motion import MotionGate
+        gate = MotionGate(zones=[[[0, 0], [40, 0], [40, 40], [0, 40]]], threshold=0.01,
+                          max_skip=100, margin=0)
+        frame = np.zeros((120, 160, 3), dtype=np.uint8)
+        self.assertTrue(gate.should_detect(frame))
+        far_change = frame.copy()
+        far_change[80:120, 120:160] = 255
+        self.assertFalse(gate.should_detect(far_change))
+        near_change = frame.copy()
+        near_change[10:30, 10:30] = 255
+        self.assertTrue(gate.should_detect(near_change))
+
+class TestDetectionPipeline(unittest.TestCase):
+    """Test the per-frame pipeline logic without running the model"""
+    
+    def test_automatic_input_size_follows_roi_crop(self):
+        """With roi_crop the automatic YOLO input size shrinks with the crop; explicit sizes are kept"""
+        from model_backend import inference_size
+        self.assertEqual(inference_size(0), 640)
+        # 648x634 crop of a 1280x720 frame: same scale as a full-frame 640 run
+        self.assertEqual(inference_size(0, (300, 50, 948, 684), 1280, 720), 352)
+        self.assertEqual(inference_size(0, (0, 0, 1280, 720), 1280, 720), 640)
+        self.assertEqual(inference_size(0, (10, 10, 20, 20), 1280, 720), 32)
+        self.assertEqual(inference_size(480, (300, 50, 948, 684), 1280, 720), 480)
+    
+    def test_zone_events_from_detections(self):
+        """Detections moving through a zone produce Entered and Exited rows"""
+        from test_yolo import DetectionPipeline, DEFAULT_CONFIG
+        from alert_system import ConsoleAlertSystem
+        config = dict(DEFAULT_CONFIG, headless=True)
+        sink = ListSink()
+        pipeline = DetectionPipeline(config, [[(0, 0), (100, 0), (100, 100), (0, 100)]], ["Door"],
+                                     event_sink=sink, camera_name="lobby", alerts=ConsoleAlertSystem())
+        for cx in (120, 90, 95, 120):
+            pipeline.process_detections(None, [(cx, 50, 0, (cx - 5, 45, cx + 5, 55), 0.9, "person")])
+        self.assertEqual([row[3] for row in sink.rows], ["Entered", "Exited"])
+        self.assertEqual([row[7] for row in sink.rows], [2, 4])
+        self.assertEqual(sink.rows[0][2], "Door")
+        self.assertEqual(sink.rows[0][-1], "lobby")
+    
+    def test_lost_objects_are_forgotten(self):
+        """A track dropped inside a zone leaves neither zone state nor a shown entry behind"""
+        from test_yolo import DetectionPipeline, DEFAULT_CONFIG
+        from alert_system import ConsoleAlertSystem
+        config = dict(DEFAULT_CONFIG, headless=True)
+        alerts = ConsoleAlertSystem()
+        alerts.config = {"alert_enabled": True, "alert_type": "console"}
+        alerts.dispatcher = None
+        pipeline = DetectionPipeline(config, [[(0, 0), (100, 0), (100, 100), (0, 100)]], ["Door"],
+                                     event_sink=ListSink(), alerts=alerts)
+        pipeline.process_detections(None, [(50, 50, 0, (45, 45, 55, 55), 0.9, "person")])
+        self.assertEqual(alerts.throttle.shown_entries, {(1, "Door")})
+        pipeline.process_detections(None, [])
+        self.assertEqual(pipeline.object_zone_status, {})
+        self.assertEqual(alerts.throttle.shown_entries, set())
+
+class TestInferenceClient(unittest.TestCase):
+    """Test the shared inference server client protocol"""
+    
+    def test_frames_travel_through_shared_memory(self):
+        """The server reads frames from shared slots and answers each request in order"""
+        import queue
+        import threading
+        from multiprocessing import shared_memory
+        from inference_server import InferenceClient, InferenceClientHandle, slot_view
+        from model_backend import Detections
+        request_queue, response_queue = queue.Queue(), queue.Queue()
+        
+        def fake_server():
+            requests = [request_queue.get() for _ in range(3)]
+            shm = shared_memory.SharedMemory(name=requests[0][1])
+            # Answer out of order; the client must restore frame order
+            for _, _, slot_bytes, slot, shape, request_id in reversed(requests):
+                value = float(slot_view(shm, slot_bytes, slot, shape)[0, 0, 0])
+                response_queue.put((request_id, Detections(np.zeros((0, 4)), np.zeros(0), np.array([value]))))
+            shm.close()
+        
+        server = threading.Thread(target=fake_server)
+        server.start()
+        client = InferenceClient(InferenceClientHandle("cam", request_queue, response_queue), slot_count=2)
+        frames = [np.full((4, 6, 3), value, dtype=np.uint8) for value in (10, 20, 30)]
+        results = client.detect(frames)
+        server.join()
+        client.close()
+        self.assertEqual([result.confidences[0] for result in results], [10.0, 20.0, 30.0])
+    
+    def test_ring_frames_are_sent_by_slot(self):
+        """Frames already in the shared frame ring are not copied"""
+        import queue
+        from inference_server import InferenceClient, InferenceClientHandle
+        from model_backend import Detections
+        from video_io import SharedFrameRing
+        ring = SharedFrameRing(2, 4, 6)
+        request_queue, response_queue = queue.Queue(), queue.Queue()
+        client = InferenceClient(InferenceClientHandle("cam", request_queue, response_queue))
+        client.frame_ring = ring
+        empty = Detections(np.zeros((0, 4)), np.zeros(0), np.zeros(0))
+        response_queue.put(((os.getpid(), 0), empty))
+        client.detect([ring.frames[1]])
+        _, shm_name, _, slot, _, _ = request_queue.get_nowait()
+        self.assertEqual((shm_name, slot), (ring.name, 1))
+        self.assertIsNone(client.slots)
+        ring.close()
+    
+    def test_server_settings_merge_cameras(self):
+        """Cameras share one model; classes are merged and the lowest threshold is used"""
+        from inference_server import server_settings
+        base = {"model_path": "yolov8n.pt", "model_backend": "pytorch", "model_int8": False,
+                "inference_imgsz": 640}
+        cameras = [dict(base, name="a", detection_classes={"person": 0}, confidence_threshold=0.5),
+                   dict(base, name="b", detection_classes={"car": 2}, confidence_threshold=0.4)]
+        settings = server_settings(cameras)
+        self.assertEqual(settings["classes"], [0, 2])
+        self.assertEqual(settings["confidence_threshold"], 0.4)
+        cameras[1]["inference_imgsz"] = 320
+        with self.assertRaises(ValueError):
+            server_settings(cameras)
+
+class TestAlertSystem(unittest.TestCase):
+    """Test the GUI alert queue and coalescing (without opening a window)"""
+    
+    def test_repeated_alerts_coalesce_per_object_and_zone(self):
+        """Entries/exits of one object in one zone share a row until it has been gone for the window"""
+        from alert_system import AlertBoard
+        board = AlertBoard(coalesce_seconds=10)
+        
+        def alert(object_id, zone, event, at):
+            return {"message": f"{object_id} {event} {zone}", "type": "warning", "object_id": object_id,
+                    "zone": zone, "event": event, "time": at}
+        
+        key = board.apply(alert(1, "Zone 1", "Entered", 0.0))
+        self.assertEqual(board.apply(alert(1, "Zone 1", "Exited", 2.0)), key)
+        self.assertEqual(board.apply(alert(1, "Zone 1", "Entered", 3.0)), key)
+        board.apply(alert(2, "Zone 1", "Entered", 3.0))
+        self.assertEqual(len(board.rows), 2)
+        self.assertEqual(board.rows[key]["count"], 3)
+        self.assertEqual(board.active_count(), 2)
+        
+        board.apply(alert(1, "Zone 1", "Exited", 4.0))
+        # Still inside a zone: stays listed; exited: expires after the window
+        self.assertEqual(board.expire(100.0), [key])
+        self.assertEqual(board.active_count(), 1)
+        
+        board.apply(alert(1, "Zone 1", "Entered", 200.0))
+        self.assertEqual(board.rows[key]["count"], 1)
+    
+    def test_object_lost_inside_zone_expires(self):
+        """An active row whose object vanished without an exit is dropped after active_seconds"""
+        from alert_system import AlertBoard
+        board = AlertBoard(coalesce_seconds=10, active_seconds=60)
+        
+        def alert(object_id, event, at):
+            return {"message": f"{object_id} {event}", "type": "warning", "object_id": object_id,
+                    "zone": "Zone 1", "event": event, "time": at}
+        
+        lost = board.apply(alert(1, "Entered", 0.0))
+        staying = board.apply(alert(2, "Entered", 0.0))
+        # A new alert for the same object and zone refreshes the row
+        board.apply(alert(2, "Exited", 50.0))
+        board.apply(alert(2, "Entered", 55.0))
+        self.assertEqual(board.expire(59.0), [])
+        self.assertEqual(board.expire(70.0), [lost])
+        self.assertEqual(board.active_count(), 1)
+        self.assertEqual(board.expire(116.0), [staying])
+        self.assertEqual(board.rows, {})
+    
+    def test_quick_exit_closes_intrusion(self):
+        """An exit right after a shown entry reaches the board, so the row stops being active"""
+        from alert_system import AlertSystem
+        alerts = AlertSystem()
+        alerts.config = {"alert_enabled": True}
+        alerts.is_running = True  # do not open a window
+        alerts.show_entry_alert(3, "Zone 1")
+        alerts.show_exit_alert(3, "Zone 1")
+        while not alerts.alert_queue.empty():
+            alerts.board.apply(alerts.alert_queue.get_nowait())
+        self.assertEqual(alerts.board.active_count(), 0)
+        alerts.board.expire(time.time() + 3600)
+        self.assertEqual(alerts.board.rows, {})
+    
+    def test_gui_cleanup_reports_held_back_alerts(self):
+        """Summaries still held by the throttle are printed when the GUI alert system shuts down"""
+        import io
+        from contextlib import redirect_stdout
+        from alert_system import AlertSystem, AlertThrottle
+        alerts = AlertSystem()
+        alerts.config = {"alert_enabled": True}
+        alerts.dispatcher = None
+        alerts.throttle = AlertThrottle(cooldown_seconds=60, rate_per_second=0, summary_seconds=30)
+        alerts.is_running = True  # do not open a window
+        for _ in range(3):
+            alerts.show_entry_alert(1, "Zone 2")
+        output = io.StringIO()
+        with redirect_stdout(output):
+            alerts.cleanup()
+        self.assertIn("2 entries to Zone 2 in the last", output.getvalue())
+        self.assertEqual(alerts.throttle.flush(force=True), [])
+    
+    def test_full_queue_drops_and_counts(self):
+        """show_alert never blocks; alerts beyond the queue size are counted as dropped"""
+        import queue
+        from alert_system import AlertSystem
+        alerts = AlertSystem()
+        alerts.config = {"alert_enabled": True}
+        alerts.alert_queue = queue.Queue(maxsize=3)
+        alerts.is_running = True  # do not open a window
+        for object_id in range(5):
+            alerts.show_entry_alert(object_id, "Zone 1")
+        self.assertEqual(alerts.alert_queue.qsize(), 3)
+        self.assertEqual(alerts.alerts_dropped, 2)
+        self.assertEqual(alerts.alert_queue.get_nowait()["event"], "Entered")
+    
+    def test_throttle_cooldown_rate_limit_and_summary(self):
+        """Repeats within the cooldown and alerts beyond the token bucket become one summary"""
+        from alert_system import AlertThrottle
+        throttle = AlertThrottle(cooldown_seconds=5, rate_per_second=0.1, burst=2, summary_seconds=30)
+        self.assertEqual(throttle.check(1, "Zone 2", "Entered", now=0.0), (True, []))
+        # The exit of a shown entry always passes
+        self.assertEqual(throttle.check(1, "Zone 2", "Exited", now=1.0), (True, []))
+        # Re-entering within the cooldown is held back, and so is its exit
+        self.assertEqual(throttle.check(1, "Zone 2", "Entered", now=2.0), (False, []))
+        self.assertEqual(throttle.check(1, "Zone 2", "Exited", now=2.5), (False, []))
+        # Other objects pass until the bucket is empty
+        self.assertTrue(throttle.check(2, "Zone 2", "Entered", now=2.0)[0])
+        self.assertFalse(throttle.check(3, "Zone 2", "Entered", now=2.0)[0])
+        # One token per 10 s
+        self.assertFalse(throttle.check(4, "Zone 2", "Entered", now=3.0)[0])
+        self.assertTrue(throttle.check(4, "Zone 2", "Entered", now=12.0)[0])
+        self.assertEqual(throttle.alerts_suppressed, 4)
+        
+        allowed, summaries = throttle.check(5, "Zone 1", "Entered", now=32.0)
+        self.assertTrue(allowed)
+        self.assertEqual(sorted(summaries), ["1 exits from Zone 2 in the last 30 s",
+                                             "3 entries to Zone 2 in the last 30 s"])
+        self.assertEqual(throttle.flush(now=100.0, force=True), [])
+    
+    def test_throttle_holds_back_exit_of_rate_limited_entry(self):
+        """An exit never shows without its entry, even once the cooldown is over"""
+        from alert_system import AlertThrottle
+        throttle = AlertThrottle(cooldown_seconds=5, rate_per_second=0.1, burst=1, summary_seconds=30)
+        self.assertTrue(throttle.check(1, "Zone 1", "Entered", now=0.0)[0])
+        # The bucket is empty: the entry of object 2 is held back, and so is its later exit
+        self.assertFalse(throttle.check(2, "Zone 1", "Entered", now=0.5)[0])
+        self.assertFalse(throttle.check(2, "Zone 1", "Exited", now=20.0)[0])
+        self.assertEqual(throttle.flush(now=40.0), ["1 entries to Zone 1 in the last 40 s",
+                                                    "1 exits from Zone 1 in the last 40 s"])
+        
+        # Objects the tracker lost no longer count as shown
+        throttle.forget([1])
+        self.assertEqual(throttle.shown_entries, set())
+        self.assertFalse(throttle.check(1, "Zone 1", "Exited", now=50.0)[0])
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    """Stand-in incident system: records bodies, fails the first `failures` requests with 503"""
+    protocol_version = "HTTP/1.1"
+    
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        server = self.server
+        server.connections.add(self.client_address)
+        if server.failures > 0:
+            server.failures -= 1
+            status = 503
+        else:
+            server.received.append(json.loads(body))
+            status = 200
+        self.send_response(status)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+    
+    def log_message(self, format, *args):
+        pass
+
+class TestAlertDispatch(unittest.TestCase):
+    """Test webhook and UNIX socket alert delivery"""
+    
+    def start_webhook(self, failures=0):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _WebhookHandler)
+        server.daemon_threads = True
+        server.received = []
+        server.connections = set()
+        server.failures = failures
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server, f"http://127.0.0.1:{server.server_address[1]}/alerts"
+    
+    def test_webhook_reuses_connection(self):
+        """Alerts are POSTed as JSON in order over a single kept-alive connection"""
+        from alert_dispatch import AlertDispatcher, WebhookSink
+        server, url = self.start_webhook()
+        sink = WebhookSink(url, timeout=2.0)
+        dispatcher = AlertDispatcher([sink], camera="lobby")
+        for object_id in range(3):
+            dispatcher.submit(f"Object {object_id} entered Zone 1", "warning", object_id, "Zone 1", "Entered")
+        dispatcher.close(timeout=5.0)
+        self.assertEqual([alert["object_id"] for alert in server.received], [0, 1, 2])
+        self.assertEqual(server.received[0]["camera"], "lobby")
+        self.assertEqual(server.received[0]["event"], "Entered")
+        self.assertEqual((sink.connections, len(server.connections)), (1, 1))
+        self.assertEqual((dispatcher.alerts_sent, dispatcher.alerts_failed), (3, 0))
+    
+    def test_webhook_retries_server_errors(self):
+        """5xx responses are retried with backoff until delivered"""
+        from alert_dispatch import AlertDispatcher, WebhookSink
+        server, url = self.start_webhook(failures=2)
+        dispatcher = AlertDispatcher([WebhookSink(url, timeout=2.0)], retries=3, retry_backoff=0.01)
+        dispatcher.submit("Object 7 entered Zone 2", "warning", 7, "Zone 2", "Entered")
+        dispatcher.close(timeout=5.0)
+        self.assertEqual([alert["object_id"] for alert in server.received], [7])
+        self.assertEqual((dispatcher.alerts_sent, dispatcher.alerts_failed), (1, 0))
+    
+    def test_unix_socket_lines(self):
+        """The socket consumer receives one JSON alert per line"""
+        from alert_dispatch import AlertDispatcher, UnixSocketSink
+        lines = []
+        
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    lines.append(json.loads(line))
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "alerts.sock")
+            server = socketserver.ThreadingUnixStreamServer(path, Handler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            try:
+                dispatcher = AlertDispatcher([UnixSocketSink(path)])
+                dispatcher.submit("Object 1 exited Zone 3", "info", 1, "Zone 3", "Exited")
+                dispatcher.submit("Object 2 exited Zone 3", "info", 2, "Zone 3", "Exited")
+                dispatcher.close(timeout=5.0)
+                deadline = time.time() + 5.0
+                while len(lines) < 2 and time.time() < deadline:
+                    time.sleep(0.01)
+            finally:
+                server.shutdown()
+                server.server_close()
+        self.assertEqual([(alert["object_id"], alert["zone"]) for alert in lines], [(1, "Zone 3"), (2, "Zone 3")])
+    
+    def test_slow_sink_never_blocks_submit(self):
+        """A stuck endpoint fills its bounded outbox; further alerts are dropped, not waited for"""
+        import asyncio
+        from alert_dispatch import AlertDispatcher
+        
+        class StuckSink:
+            async def send(self, payload):
+                await asyncio.sleep(60)
+            
+            def close(self):
+                pass
+        
+        dispatcher = AlertDispatcher([StuckSink()], outbox_size=2)
+        start = time.perf_counter()
+        for object_id in range(50):
+            dispatcher.submit("alert", "warning", object_id, "Zone 1", "Entered")
+        self.assertLess(time.perf_counter() - start, 1.0)
+        deadline = time.time() + 5.0
+        while dispatcher.alerts_dropped < 47 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertGreaterEqual(dispatcher.alerts_dropped, 47)
+        self.assertLessEqual(dispatcher.pending(), 2)
+        dispatcher.close(timeout=0.1)
+
+def fake_camera_worker(camera_config, event_queue, cpu=None, inference=None):
+    """Supervisor test worker: crash on the first start, then report one event"""
+    marker = camera_config["marker"]
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        sys.exit(1)
+    event_queue.put(["2025-01-01 00:00:00", 1, "Zone 1", "Entered", "person", 0.9, "", 1,
+                     camera_config["name"]])
+
+class ListSink:
+    def __init__(self):
+        self.rows = []
+    
+    def write(self, row):
+        self.rows.append(row)
+
+class TestStageTimer(unittest.TestCase):
+    """Test the per-stage latency statistics"""
+    
+    def test_rolling_percentiles(self):
+        """Percentiles cover the rolling window while counts and means cover the run"""
+        from stage_timer import StageTimer
+        timer = StageTimer(window=100)
+        for ms in range(1, 201):
+            timer.record("inference", ms / 1000.0)
+        with timer.measure("zones"):
+            pass
+        stats = timer.summary()
+        self.assertEqual(list(stats), ["inference", "zones"])
+        self.assertEqual(stats["inference"]["count"], 200)
+        self.assertAlmostEqual(stats["inference"]["mean_ms"], 100.5)
+        self.assertAlmostEqual(stats["inference"]["p50_ms"], 150.5)
+        self.assertGreater(stats["inference"]["p99_ms"], stats["inference"]["p95_ms"])
+        self.assertEqual(len(timer.overlay_lines()), 2)
+    
+    def test_disabled_timer_records_nothing(self):
+        """A disabled timer keeps no samples"""
+        from stage_timer import StageTimer
+        timer = StageTimer(enabled=False)
+        with timer.measure("draw"):
+            pass
+        timer.record("draw", 0.1)
+        self.assertEqual(timer.summary(), {})
+
+class TestMetricsEndpoint(unittest.TestCase):
+    """Test the Prometheus-style metrics endpoint"""
+    
+    def test_scrape_over_localhost(self):
+        """Counters, events, histogram buckets and callbacks appear in the exposition"""
+        import urllib.request
+        import urllib.error
+        from metrics import PipelineMetrics, MetricsServer
+        metrics = PipelineMetrics("gate")
+        metrics.frames_processed = 42
+        metrics.record_event("Zone \"A\"", "Entered")
+        metrics.inference_seconds.observe(0.02)
+        metrics.inference_seconds.observe(3.0)
+        metrics.add_callback("zone_guard_active_tracks", "gauge", "Objects currently tracked", lambda: 3)
+        server = MetricsServer(metrics, port=0).start()
+        try:
+            url = f"http://127.0.0.1:{server.port}"
+            with urllib.request.urlopen(f"{url}/metrics", timeout=5) as response:
+                self.assertTrue(response.headers["Content-Type"].startswith("text/plain"))
+                body = response.read().decode("utf-8")
+            with self.assertRaises(urllib.error.HTTPError):
+                urllib.request.urlopen(f"{url}/other", timeout=5)
+        finally:
+            server.stop()
+        lines = body.splitlines()
+        self.assertIn('zone_guard_frames_processed_total{camera="gate"} 42', lines)
+        self.assertIn('zone_guard_events_total{camera="gate",zone="Zone \\"A\\"",event="Entered"} 1', lines)
+        self.assertIn('zone_guard_inference_seconds_bucket{camera="gate",le="0.025"} 1', lines)
+        self.assertIn('zone_guard_inference_seconds_bucket{camera="gate",le="+Inf"} 2', lines)
+        self.assertIn('zone_guard_inference_seconds_count{camera="gate"} 2', lines)
+        self.assertIn('zone_guard_active_tracks{camera="gate"} 3', lines)
+        self.assertIn("# TYPE zone_guard_inference_seconds histogram", lines)
+
+class TestBenchmark(unittest.TestCase):
+    """Test the benchmark helpers"""
+    
+    def test_micro_benchmarks_report_latencies(self):
+        """Tracker and zone micro-benchmarks return latency stats per crowd size"""
+        from benchmark import run_micro_benchmarks
+        zones = [[(0, 0), (640, 0), (640, 720), (0, 720)]]
+        results = run_micro_benchmarks(zones, sizes=(10,), frame_count=5)
+        self.assertIn("p95_us", results["tracker"]["10"])
+        self.assertGreaterEqual(results["tracker"]["10"]["tracks_created"], 10)
+        self.assertIn("p99_us", results["zones"]["10"]["mask"])
+        self.assertIn("mean_us", results["zones"]["10"]["point_polygon_test"])
+    
+    def test_compare_flags_regressions(self):
+        """Slower fps, slower micro-benchmarks and changed events are reported"""
+        from benchmark import compare_results
+        baseline = {"cases": [{"name": "video2", "fps": 10.0, "events": 9}],
+                    "micro": {"tracker": {"100": {"mean_us": 500.0}}}}
+        current = {"cases": [{"name": "video2", "fps": 8.0, "events": 8}],
+                   "micro": {"tracker": {"100": {"mean_us": 510.0}}}}
+        lines, regressions = compare_results(baseline, current, tolerance=0.10)
+        self.assertEqual(regressions, 1)
+        self.assertTrue(any("REGRESSION" in line and "video2" in line for line in lines))
+        self.assertTrue(any("events changed" in line for line in lines))
+
+class TestDetectionReplay(unittest.TestCase):
+    """Test detection recording and replay"""
+    
+    def test_recording_round_trip(self):
+        """Boxes (shifted by the ROI offset), classes, confidences and skipped frames survive"""
+        from detection_replay import DetectionRecorder, read_detections
+        from model_backend import Detections
+        detections = Detections(np.array([[10, 20, 30, 40]], dtype=np.float32), np.array([2.0]),
+                                np.array([0.75], dtype=np.float32))
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "detections.zgd")
+            recorder = DetectionRecorder(path, 1280, 720)
+            recorder.write(1, detections, offset=(100, 50, 600, 400))
+            recorder.write(2, None)
+            recorder.close()
+            header, frames = read_detections(path)
+        self.assertEqual((header["width"], header["height"]), (1280, 720))
+        self.assertEqual([number for number, _ in frames], [1, 2])
+        self.assertEqual(frames[0][1].boxes.tolist(), [[110, 70, 130, 90]])
+        self.assertEqual(frames[0][1].class_ids.tolist(), [2])
+        self.assertAlmostEqual(float(frames[0][1].confidences[0]), 0.75)
+        self.assertIsNone(frames[1][1])
+    
+    def test_replay_matches_golden_log(self):
+        """Replaying the recorded video2 detections reproduces the golden event log"""
+        from detection_replay import replay, ListEventSink, compare_event_rows, read_log_rows
+        from event_log import LOG_COLUMNS
+        from test_yolo import DEFAULT_CONFIG, load_zones
+        zones, zone_labels = load_zones(os.path.join("fixtures", "video2_zones.json"))
+        sink = ListEventSink()
+        summary = replay(os.path.join("fixtures", "video2_detections.zgd"), DEFAULT_CONFIG, zones, zone_labels,
+                         sink)
+        self.assertEqual(summary["frames"], 190)
+        replayed = [dict(zip(LOG_COLUMNS, row)) for row in sink.rows]
+        golden = read_log_rows(os.path.join("fixtures", "video2_golden_logs.csv"))
+        self.assertEqual(compare_event_rows(golden, replayed), [])
+
+class TestCameraSupervisor(unittest.TestCase):
+    """Test the multi-camera supervisor"""
+    
+    def test_camera_configs_override_shared_settings(self):
+        """Camera entries override shared settings and always run headless"""
+        from supervisor import camera_configs
+        config = {"video_source": "video2.mp4", "zones_file": "zones.json", "headless": False,
+                  "summary_file": "run_summary.json",
+                  "cameras": [{"name": "gate", "video_source": "rtsp://gate"}, {"zones_file": "dock.json"}]}
+        cameras = camera_configs(config)
+        self.assertEqual([camera["name"] for camera in cameras], ["gate", "camera2"])
+        self.assertEqual(cameras[0]["video_source"], "rtsp://gate")
+        self.assertEqual(cameras[1]["zones_file"], "dock.json")
+        self.assertTrue(all(camera["headless"] for camera in cameras))
+        self.assertEqual(cameras[0]["summary_file"], "run_summary_gate.json")
+        self.assertNotIn("cameras", cameras[0])
+    
+    def test_crashed_worker_restarts_and_events_are_merged(self):
+        """A crashing worker is restarted and every camera's events reach one sink"""
+        from supervisor import CameraSupervisor
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cameras = [{"name": name, "marker": os.path.join(temp_dir, name)} for name in ("a", "b")]
+            sink = ListSink()
+            supervisor = CameraSupervisor(cameras, sink, restart_delay=0.1,
+                                          worker_target=fake_camera_worker)
+            stats = supervisor.run()
+        self.assertEqual(stats, {"a": {"restarts": 1}, "b": {"restarts": 1}})
+        self.assertEqual(sorted(row[-1] for row in sink.rows), ["a", "b"])
+
 def run_system_check():
     """Run a comprehensive system check"""
     print("=== Zone Guard System Check ===")
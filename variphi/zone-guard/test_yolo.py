@@ -1,243 +1,693 @@
 import cv2
 import json
+import argparse
 import numpy as np
-from ultralytics import YOLO
 from datetime import datetime
-import csv
 import os
+import signal
+import sys
+import time
 from alert_system import alert_system
+from video_io import FrameGrabber, AsyncVideoWriter, ClipRecorder, SharedFrameRing, is_live_source
+from tracker import CentroidTracker
+from zone_mask import ZoneMask, NO_ZONE, zone_polygon_arrays, zones_bounding_box
+from motion import MotionGate
+from model_backend import load_model, detections_from_result, inference_size
+from event_log import create_event_sink
+from stage_timer import StageTimer
+from metrics import PipelineMetrics, MetricsServer
+from detection_replay import DetectionRecorder
 
-# ----------------- Load Configuration -----------------
-try:
-    with open("config.json", "r") as f:
-        config = json.load(f)
-    video_source = config.get("video_source", "video2.mp4")
-    model_path = config.get("model_path", "yolov8n.pt")
-    confidence_threshold = config.get("confidence_threshold", 0.5)
-    tracking_distance_threshold = config.get("tracking_distance_threshold", 50)
-    log_file = config.get("log_file", "logs.csv")
-    zones_file = config.get("zones_file", "zones.json")
-    detection_classes = config.get("detection_classes", {})
-    save_video = config.get("save_video", False)
-    video_output = config.get("video_output", "output.mp4")
-except FileNotFoundError:
-    print("Config file not found, using default settings")
-    video_source = "video2.mp4"
-    model_path = "yolov8n.pt"
-    confidence_threshold = 0.5
-    tracking_distance_threshold = 50
-    log_file = "logs.csv"
-    zones_file = "zones.json"
-    detection_classes = {"person": 0, "car": 2, "motorcycle": 3, "bus": 5, "truck": 7}
-    save_video = False
-    video_output = "output.mp4"
-
-# ----------------- Load Zones -----------------
-try:
-    with open(zones_file, "r") as f:
-        zones_data = json.load(f)
-        if isinstance(zones_data, dict):
-            zones = zones_data.get("zones", [])
-            zone_labels = zones_data.get("labels", [])
+# ----------------- Configuration -----------------
+DEFAULT_CONFIG = {
+    "video_source": "video2.mp4",
+    "model_path": "yolov8n.pt",
+    "confidence_threshold": 0.5,
+    "tracking_distance_threshold": 50,
+    "log_file": "logs.csv",
+    "zones_file": "zones.json",
+    "detection_classes": {"person": 0, "car": 2, "motorcycle": 3, "bus": 5, "truck": 7},
+    "save_video": False,
+    "video_output": "output.mp4",
+    "inference_batch_size": 1,
+    "threaded_capture": True,
+    "capture_queue_size": 4,
+    "capture_policy": "auto",
+    "zone_mask": True,
+    "headless": False,
+    "roi_crop": False,
+    "roi_margin": 32,
+    "inference_imgsz": 0,
+    "motion_gating": False,
+    "motion_threshold": 0.002,
+    "motion_max_skip": 30,
+    "model_backend": "pytorch",
+    "model_int8": False,
+    "async_video_writer": True,
+    "video_writer_queue_size": 32,
+    "event_clips": False,
+    "clip_dir": "clips",
+    "clip_pre_roll_seconds": 2,
+    "clip_post_roll_seconds": 5,
+    "log_batch_size": 50,
+    "log_flush_interval": 1.0,
+    "log_fsync": "close",
+    "log_backend": "csv",
+    "events_db": "events.db",
+    "progress_interval": 2.0,
+    "shared_frame_ring": False,
+    "frame_ring_slots": 0,
+    "stage_timing": True,
+    "timing_window": 1000,
+    "timing_overlay": False,
+    "summary_file": "run_summary.json",
+    "metrics_enabled": False,
+    "metrics_host": "127.0.0.1",
+    "metrics_port": 9108,
+    "record_detections": "",
+}
+
+def load_config(path="config.json"):
+    """Load config.json on top of the defaults"""
+    config = dict(DEFAULT_CONFIG)
+    try:
+        with open(path, "r") as f:
+            config.update(json.load(f))
+    except FileNotFoundError:
+        print("Config file not found, using default settings")
+    config["inference_batch_size"] = max(1, int(config["inference_batch_size"]))
+    return config
+
+def load_zones(zones_file):
+    """Return (zones, zone_labels) from a zones file (empty if missing)"""
+    try:
+        with open(zones_file, "r") as f:
+            zones_data = json.load(f)
+            if isinstance(zones_data, dict):
+                zones = zones_data.get("zones", [])
+                zone_labels = zones_data.get("labels", [])
+            else:
+                zones = zones_data
+                zone_labels = [f"Zone {i+1}" for i in range(len(zones))]
+        print(f"Loaded {len(zones)} zones: {zone_labels}")
+    except FileNotFoundError:
+        print(f"Warning: {zones_file} not found. No zones will be monitored.")
+        zones = []
+        zone_labels = []
+    return zones, zone_labels
+
+def read_batch(source, batch_size):
+    """Read up to batch_size frames from the capture or frame grabber"""
+    frames = []
+    while len(frames) < batch_size:
+        ret, frame = source.read()
+        if not ret:
+            break
+        frames.append(frame)
+    return frames
+
+class DetectionPipeline:
+    """Detection, tracking, zone checks and logging for one video source.
+
+    run() opens the source, processes it until it ends (or 'q' is pressed
+    in the preview) and returns a summary dict. An event_sink can be passed
+    in to send events somewhere other than the configured log, which is
+    how the multi-camera supervisor aggregates several pipelines. A
+    detector (e.g. an InferenceClient of the shared inference server) can
+    replace the local model; it must map a list of frames to Detections.
+    """
+
+    def __init__(self, config, zones, zone_labels, event_sink=None, camera_name="", alerts=alert_system,
+                 detector=None):
+        self.config = config
+        self.zones = zones
+        self.zone_labels = zone_labels
+        self.camera_name = camera_name
+        self.alerts = alerts
+        self.detector = detector
+        self.event_sink = event_sink
+        self.owns_event_sink = event_sink is None
+
+        self.detection_classes = config["detection_classes"]
+        self.confidence_threshold = config["confidence_threshold"]
+        # Let predict() drop unused classes and low-confidence boxes before NMS,
+        # and map class ids back to names without a per-box reverse search
+        self.class_names_by_id = {class_id: name for name, class_id in self.detection_classes.items()}
+        self.detection_class_ids = sorted(self.class_names_by_id)
+
+        # Zone polygons never change during a run, so build them once
+        self.zone_polygons = zone_polygon_arrays(zones)
+        # Zone label anchors for the overlay (polygon vertex centroid)
+        self.zone_label_positions = [
+            (sum(p[0] for p in poly) // len(poly), sum(p[1] for p in poly) // len(poly)) if poly else None
+            for poly in zones
+        ]
+
+        self.tracker = CentroidTracker(config["tracking_distance_threshold"])
+        self.object_zone_status = {}    # id: zone_index
+        self.frame_count = 0
+        self.events_logged = 0
+
+        self.cap = None
+        self.model = None
+        self.frame_grabber = None
+        self.frame_ring = None
+        self.frame_source = None
+        self.zone_mask = None
+        self.roi_box = None
+        self.imgsz = inference_size(config["inference_imgsz"])
+        self.motion_gate = None
+        self.video_writer = None
+        self.clip_recorder = None
+        self.show_preview = not config["headless"]
+        self.render_enabled = self.show_preview
+
+        # Rolling per-stage latencies; capture, motion and inference samples
+        # are per frame, averaged over the batch
+        self.timer = StageTimer(config["timing_window"], config["stage_timing"])
+        self.timing_overlay = config["timing_overlay"] and config["stage_timing"]
+        self.timing_lines = []
+        self.start_time = None
+        self.elapsed = 0.0
+
+        # Counters for the optional /metrics endpoint, updated without locks
+        self.metrics = PipelineMetrics(camera_name)
+        self.metrics_server = None
+        self.detection_recorder = None
+
+    # ----------------- Setup -----------------
+    def open_source(self):
+        """Open the video source and everything sized from it"""
+        config = self.config
+        video_source = config["video_source"]
+        self.cap = cv2.VideoCapture(video_source)
+        if not self.cap.isOpened():
+            raise RuntimeError(f"Could not open video source: {video_source}")
+
+        # Get video properties
+        fps = int(self.cap.get(cv2.CAP_PROP_FPS))
+        width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+        # When the frame size is known, rasterize the zones into a lookup
+        # mask for O(1) zone checks
+        if config["zone_mask"] and self.zones and width > 0 and height > 0:
+            self.zone_mask = ZoneMask(self.zones, width, height)
+
+        # Record raw detections for offline replay (detection_replay.py)
+        if config["record_detections"]:
+            self.detection_recorder = DetectionRecorder(config["record_detections"], max(0, width), max(0, height))
+            print(f"Recording detections to: {config['record_detections']}")
+
+        # Optionally run inference only on the region covering the zones
+        if config["roi_crop"] and width > 0 and height > 0:
+            self.roi_box = zones_bounding_box(self.zones, width, height, config["roi_margin"])
+            if self.roi_box:
+                x1, y1, x2, y2 = self.roi_box
+                print(f"Inference region: {self.roi_box} ({(x2 - x1) * (y2 - y1) * 100 // (width * height)}% of frame)")
+                self.imgsz = inference_size(config["inference_imgsz"], self.roi_box, width, height)
+                matched = inference_size(0, self.roi_box, width, height)
+                if self.imgsz > matched:
+                    print(f"Warning: inference_imgsz {self.imgsz} upscales the {x2 - x1}x{y2 - y1} crop; "
+                          f"{matched} (or 0 for automatic) keeps full-frame speed")
+                print(f"Inference input size: {self.imgsz}")
+
+        # Decode into shared memory slots that the writers and the inference
+        # server read in place, instead of allocating and copying every frame
+        if config["shared_frame_ring"] and config["threaded_capture"] and width > 0 and height > 0:
+            slot_count = config["frame_ring_slots"]
+            if not slot_count:
+                slot_count = config["capture_queue_size"] + config["inference_batch_size"] + 2
+                if config["save_video"] and config["async_video_writer"]:
+                    slot_count += config["video_writer_queue_size"]
+            self.frame_ring = SharedFrameRing(slot_count, height, width)
+            if getattr(self.detector, "frame_ring", False) is None:
+                self.detector.frame_ring = self.frame_ring
+            print(f"Shared frame ring: {slot_count} slots of {width}x{height}")
+
+        # Setup video writer if saving is enabled
+        if config["save_video"]:
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            self.video_writer = cv2.VideoWriter(config["video_output"], fourcc, fps, (width, height))
+            if config["async_video_writer"]:
+                # Encode on a background thread so recording doesn't stall inference
+                self.video_writer = AsyncVideoWriter(self.video_writer, config["video_writer_queue_size"],
+                                                     self.frame_ring)
+
+        # Event clips: keep a pre-roll ring buffer and record only around entries
+        if config["event_clips"]:
+            if width > 0 and height > 0:
+                self.clip_recorder = ClipRecorder(width, height, fps, config["clip_dir"],
+                                                  config["clip_pre_roll_seconds"], config["clip_post_roll_seconds"],
+                                                  frame_ring=self.frame_ring)
+                print(f"Event clips: {config['clip_pre_roll_seconds']}s pre-roll, "
+                      f"{config['clip_post_roll_seconds']}s post-roll -> {config['clip_dir']}/")
+            else:
+                print("Warning: video source does not report its frame size, event clips disabled")
+
+        # Motion gating skips inference while nothing moves inside or near the zones
+        if config["motion_gating"]:
+            self.motion_gate = MotionGate(self.zones, config["motion_threshold"], config["motion_max_skip"],
+                                          margin=config["roi_margin"])
+            print(f"Motion gating: threshold {config['motion_threshold']}, max skip {config['motion_max_skip']} frames")
+
+        # Decode on a background thread so cap.read() overlaps with inference
+        self.frame_source = self.cap
+        if config["threaded_capture"]:
+            capture_policy = config["capture_policy"]
+            if capture_policy == "auto":
+                capture_policy = "drop_oldest" if is_live_source(video_source) else "block"
+            self.frame_grabber = FrameGrabber(self.cap, config["capture_queue_size"], capture_policy,
+                                              self.frame_ring).start()
+            self.frame_source = self.frame_grabber
+            print(f"Threaded capture: queue size {config['capture_queue_size']}, policy '{capture_policy}'")
+
+        self.render_enabled = (self.show_preview or self.video_writer is not None
+                               or self.clip_recorder is not None)
+
+    def start_metrics_server(self):
+        """Register scrape-time metrics and serve them over HTTP"""
+        metrics = self.metrics
+        metrics.add_callback("zone_guard_active_tracks", "gauge", "Objects currently tracked",
+                             lambda: len(self.tracker.centroids))
+        if self.frame_grabber:
+            metrics.add_callback("zone_guard_frames_dropped_total", "counter",
+                                 "Frames dropped by the capture stage", lambda: self.frame_grabber.frames_dropped)
+        if self.motion_gate:
+            metrics.add_callback("zone_guard_frames_skipped_total", "counter",
+                                 "Frames where motion gating skipped the detector",
+                                 lambda: self.motion_gate.frames_skipped)
+        if hasattr(self.alerts, "alert_queue"):
+            metrics.add_callback("zone_guard_alert_queue_depth", "gauge", "Alerts waiting to be shown",
+                                 lambda: self.alerts.alert_queue.qsize())
+        if hasattr(self.alerts, "alerts_dropped"):
+            metrics.add_callback("zone_guard_alerts_dropped_total", "counter",
+                                 "Alerts dropped because the alert queue was full",
+                                 lambda: self.alerts.alerts_dropped)
+        if hasattr(self.alerts, "throttle"):
+            metrics.add_callback("zone_guard_alerts_suppressed_total", "counter",
+                                 "Alerts held back by the cooldown or rate limit",
+                                 lambda: self.alerts.throttle.alerts_suppressed)
+        if getattr(self.alerts, "dispatcher", None):
+            dispatcher = self.alerts.dispatcher
+            metrics.add_callback("zone_guard_alert_outbox_depth", "gauge", "Alerts waiting for remote delivery",
+                                 dispatcher.pending)
+            metrics.add_callback("zone_guard_alerts_undelivered_total", "counter",
+                                 "Remote alerts dropped (outbox full) or failed after retries",
+                                 lambda: dispatcher.alerts_dropped + dispatcher.alerts_failed)
+        if hasattr(self.event_sink, "row_queue"):
+            metrics.add_callback("zone_guard_event_log_queue_depth", "gauge", "Event rows waiting to be written",
+                                 lambda: self.event_sink.row_queue.qsize())
+        self.metrics_server = MetricsServer(metrics, self.config["metrics_host"], self.config["metrics_port"]).start()
+        print(f"Metrics: http://{self.metrics_server.host}:{self.metrics_server.port}/metrics")
+
+    def load_model(self):
+        """Load the detector for the configured backend"""
+        config = self.config
+        if self.detector is not None:
+            print(f"Using shared detector: {self.detector}")
+            return
+        self.model = load_model(config["model_path"], config["model_backend"], config["model_int8"], self.imgsz)
+        print(f"Loaded YOLO model: {config['model_path']} "
+              f"(backend: {config['model_backend']}{', INT8' if config['model_int8'] else ''})")
+
+    def setup_logging(self):
+        """Create the configured event sink unless one was passed in"""
+        if self.event_sink is None:
+            config = self.config
+            # Rows are batched and written to CSV or SQLite on a background thread
+            self.event_sink = create_event_sink(config["log_backend"], config["log_file"], config["events_db"],
+                                                config["log_batch_size"], config["log_flush_interval"],
+                                                config["log_fsync"])
+
+    @property
+    def log_file_path(self):
+        if self.config["log_backend"] == "sqlite":
+            return self.config["events_db"]
+        return self.config["log_file"]
+
+    # ----------------- Detection -----------------
+    def crop_to_roi(self, frame):
+        """Slice the inference region out of a full frame (no copy)"""
+        x1, y1, x2, y2 = self.roi_box
+        return frame[y1:y2, x1:x2]
+
+    def detect(self, frames):
+        """Run YOLO once over a batch; returns Detections per frame (None if skipped)"""
+        # Skip the detector on frames where nothing moved near the zones
+        if self.motion_gate:
+            start = time.perf_counter()
+            detect_flags = [self.motion_gate.should_detect(frame) for frame in frames]
+            self.timer.record("motion", (time.perf_counter() - start) / len(frames))
         else:
-            zones = zones_data
-            zone_labels = [f"Zone {i+1}" for i in range(len(zones))]
-    print(f"Loaded {len(zones)} zones: {zone_labels}")
-except FileNotFoundError:
-    print(f"Warning: {zones_file} not found. No zones will be monitored.")
-    zones = []
-    zone_labels = []
-
-# ----------------- Video Setup -----------------
-cap = cv2.VideoCapture(video_source)
-if not cap.isOpened():
-    print(f"Error: Could not open video source: {video_source}")
-    exit()
-
-# Get video properties
-fps = int(cap.get(cv2.CAP_PROP_FPS))
-width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-
-# Setup video writer if saving is enabled
-video_writer = None
-if save_video:
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    video_writer = cv2.VideoWriter(video_output, fourcc, fps, (width, height))
-
-# ----------------- YOLO Model -----------------
-try:
-    model = YOLO(model_path)
-    print(f"Loaded YOLO model: {model_path}")
-except Exception as e:
-    print(f"Error loading model {model_path}: {e}")
-    exit()
-
-# ----------------- Tracker Setup -----------------
-object_centroids = {}      # id: (cx, cy)
-object_id_count = 0
-object_zone_status = {}    # id: zone_index
-object_classes = {}        # id: class_name
-
-# ----------------- CSV Logging -----------------
-log_file_path = log_file
-csv_writer = None
-log_file_handle = None
-
-def setup_logging():
-    global csv_writer, log_file_handle
-    log_file_handle = open(log_file_path, "w", newline="")
-    csv_writer = csv.writer(log_file_handle)
-    csv_writer.writerow(["Timestamp", "ObjectID", "Zone", "Event", "Class", "Confidence"])
-
-def close_logging():
-    if log_file_handle:
-        log_file_handle.close()
-
-setup_logging()
-
-# ----------------- Video Processing -----------------
-print("Starting video processing...")
-print(f"Monitoring classes: {list(detection_classes.keys())}")
-print(f"Confidence threshold: {confidence_threshold}")
-print("Press 'q' to quit")
-
-frame_count = 0
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
-
-    frame_count += 1
-    
-    # Run YOLO detection
-    results = model.predict(source=frame, save=False, verbose=False)
-    
-    new_centroids = []
-
-    # Process detections
-    for result in results:
-        if result.boxes is not None:
-            boxes = result.boxes.xyxy.cpu().numpy()
-            class_ids = result.boxes.cls.cpu().numpy()
-            confidences = result.boxes.conf.cpu().numpy()
-
-            for i, box in enumerate(boxes):
-                x1, y1, x2, y2 = box.astype(int)
-                label = int(class_ids[i])
-                confidence = confidences[i]
-                
-                # Filter by class and confidence
-                if label in detection_classes.values() and confidence >= confidence_threshold:
-                    cx, cy = int((x1 + x2) // 2), int((y1 + y2) // 2)
-                    class_name = [k for k, v in detection_classes.items() if v == label][0]
-                    new_centroids.append((cx, cy, label, (x1, y1, x2, y2), confidence, class_name))
-
-    # ----------------- Assign IDs (Simple Centroid Tracker) -----------------
-    updated_centroids = {}
-    updated_classes = {}
-    
-    for cx, cy, label, bbox, confidence, class_name in new_centroids:
-        assigned = False
-        for oid, (ocx, ocy) in object_centroids.items():
-            if np.hypot(cx - ocx, cy - ocy) < tracking_distance_threshold:
-                updated_centroids[oid] = (cx, cy)
-                updated_classes[oid] = class_name
-                assigned = True
-                break
-        if not assigned:
-            object_id_count += 1
-            updated_centroids[object_id_count] = (cx, cy)
-            updated_classes[object_id_count] = class_name
-    
-    object_centroids = updated_centroids
-    object_classes = updated_classes
-
-    # ----------------- Zone Check -----------------
-    for oid, (cx, cy) in object_centroids.items():
-        inside_zone = None
-        for idx, poly in enumerate(zones):
-            polygon_np = np.array(poly, dtype=np.int32).reshape((-1, 1, 2))
+            detect_flags = [True] * len(frames)
+        detect_frames = [frame for frame, detect in zip(frames, detect_flags) if detect]
+
+        results = []
+        if detect_frames:
+            start = time.perf_counter()
+            inputs = [self.crop_to_roi(frame) for frame in detect_frames] if self.roi_box else detect_frames
+            if self.detector is not None:
+                results = self.detector.detect(inputs)
+            else:
+                results = [detections_from_result(result) for result in
+                           self.model.predict(source=inputs, imgsz=self.imgsz,
+                                              classes=self.detection_class_ids, conf=self.confidence_threshold,
+                                              save=False, verbose=False)]
+            frame_seconds = (time.perf_counter() - start) / len(detect_frames)
+            self.timer.record("inference", frame_seconds)
+            for _ in detect_frames:
+                self.metrics.inference_seconds.observe(frame_seconds)
+        result_iter = iter(results)
+        return [next(result_iter) if detect else None for detect in detect_flags]
+
+    def extract_detections(self, result):
+        """Filter Detections down to (cx, cy, label, bbox, confidence, class_name) tuples"""
+        new_centroids = []
+
+        boxes = result.boxes
+        if self.roi_box:
+            # Map crop coordinates back to the full frame
+            x1, y1 = self.roi_box[0], self.roi_box[1]
+            boxes = boxes + np.array([x1, y1, x1, y1], dtype=boxes.dtype)
+
+        # predict() already filters classes and confidence; a shared detector
+        # may run with looser settings, so check both again here
+        for box, label, confidence in zip(boxes.astype(int), result.class_ids.astype(int).tolist(),
+                                          result.confidences):
+            class_name = self.class_names_by_id.get(label)
+            if class_name is None or confidence < self.confidence_threshold:
+                continue
+            x1, y1, x2, y2 = box.tolist()
+            cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
+            new_centroids.append((cx, cy, label, (x1, y1, x2, y2), confidence, class_name))
+        return new_centroids
+
+    # ----------------- Per-frame Processing -----------------
+    def find_zone(self, cx, cy):
+        """Index of the first zone containing the point, or None"""
+        for idx, polygon_np in enumerate(self.zone_polygons):
             if cv2.pointPolygonTest(polygon_np, (cx, cy), False) >= 0:
-                inside_zone = idx
-                break
+                return idx
+        return None
+
+    def zone_name(self, zone_index):
+        if zone_index < len(self.zone_labels):
+            return self.zone_labels[zone_index]
+        return f"Zone {zone_index}"
 
-        prev_zone = object_zone_status.get(oid)
-        if prev_zone != inside_zone:
-            event_type = ""
-            zone_name = ""
-            
-            if prev_zone is None and inside_zone is not None:
-                event_type = "Entered"
-                zone_name = zone_labels[inside_zone] if inside_zone < len(zone_labels) else f"Zone {inside_zone}"
-                # Show alert for entry
-                alert_system.show_entry_alert(oid, zone_name)
-                
-            elif prev_zone is not None and inside_zone is None:
-                event_type = "Exited"
-                zone_name = zone_labels[prev_zone] if prev_zone < len(zone_labels) else f"Zone {prev_zone}"
-                # Show alert for exit
-                alert_system.show_exit_alert(oid, zone_name)
-                
-            elif prev_zone != inside_zone:
-                event_type = "Moved"
-                zone_name = zone_labels[inside_zone] if inside_zone < len(zone_labels) else f"Zone {inside_zone}"
-
-            if event_type:
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                class_name = object_classes.get(oid, "Unknown")
-                csv_writer.writerow([timestamp, oid, zone_name, event_type, class_name, confidence])
-                print(f"[{timestamp}] Object {oid} ({class_name}) {event_type} {zone_name}")
-
-        object_zone_status[oid] = inside_zone
-
-    # ----------------- Draw -----------------
-    # Draw objects
-    for oid, (cx, cy) in object_centroids.items():
-        class_name = object_classes.get(oid, "Unknown")
-        color = (0, 255, 0) if object_zone_status.get(oid) is None else (0, 0, 255)
-        
-        cv2.circle(frame, (cx, cy), 5, color, -1)
-        cv2.putText(frame, f"ID {oid} ({class_name})", (cx + 5, cy - 5), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
-
-    # Draw zones
-    for i, (poly, label) in enumerate(zip(zones, zone_labels)):
-        polygon_np = np.array(poly, dtype=np.int32).reshape((-1, 1, 2))
-        cv2.polylines(frame, [polygon_np], True, (255, 0, 0), 2)
-        
-        # Add zone label
-        if len(poly) > 0:
-            center_x = sum(p[0] for p in poly) // len(poly)
-            center_y = sum(p[1] for p in poly) // len(poly)
-            cv2.putText(frame, label, (center_x-20, center_y), 
+    def process_frame(self, frame, result):
+        """Track, zone-check, log and draw a single frame's detections.
+
+        result is None when motion gating skipped the detector for this frame.
+        Returns False when the user asked to quit.
+        """
+        if self.detection_recorder:
+            self.detection_recorder.write(self.frame_count + 1, result, self.roi_box)
+        detections = None if result is None else self.extract_detections(result)
+        return self.process_detections(frame, detections)
+
+    def process_detections(self, frame, detections):
+        """Per-frame logic after inference; detections is None to carry tracks forward"""
+        self.frame_count += 1
+        self.metrics.frames_processed += 1
+        tracker = self.tracker
+        timer = self.timer
+
+        # ----------------- Assign IDs (Centroid Tracker) -----------------
+        with timer.measure("tracking"):
+            if detections is None:
+                # Nothing moved: carry the previous tracks forward unchanged
+                object_centroids = tracker.centroids
+            else:
+                object_centroids = tracker.update(
+                    [(cx, cy) for cx, cy, _, _, _, _ in detections],
+                    [class_name for _, _, _, _, _, class_name in detections],
+                    [confidence for _, _, _, _, confidence, _ in detections])
+            object_classes = tracker.classes
+
+        # ----------------- Zone Check -----------------
+        with timer.measure("zones"):
+            self.check_zones(object_centroids, object_classes)
+
+        # ----------------- Draw -----------------
+        if frame is None:
+            return True
+        # Skip all rendering work when nothing consumes the annotated frame
+        if self.render_enabled:
+            with timer.measure("draw"):
+                self.draw_overlay(frame, object_centroids, object_classes)
+
+        # Write frame if saving video
+        if self.video_writer or self.clip_recorder:
+            with timer.measure("write"):
+                if self.video_writer:
+                    self.video_writer.write(frame)
+                if self.clip_recorder:
+                    self.clip_recorder.add_frame(frame)
+
+        if self.show_preview:
+            with timer.measure("display"):
+                cv2.imshow("Zone Guard - Detection", frame)
+                key = cv2.waitKey(1) & 0xFF
+            if key == ord("q"):
+                return False
+        return True
+
+    def check_zones(self, object_centroids, object_classes):
+        """Update zone membership and log Entered/Exited/Moved events"""
+        if self.zone_mask is not None:
+            # Resolve every centroid of the frame with one fancy-indexing lookup
+            zone_indices = self.zone_mask.lookup(list(object_centroids.values())).tolist()
+            zone_indices = [None if idx == NO_ZONE else idx for idx in zone_indices]
+        else:
+            zone_indices = [self.find_zone(cx, cy) for cx, cy in object_centroids.values()]
+
+        for oid, inside_zone in zip(object_centroids, zone_indices):
+            prev_zone = self.object_zone_status.get(oid)
+            if prev_zone != inside_zone:
+                event_type = ""
+                zone_name = ""
+                clip_path = ""
+
+                if prev_zone is None and inside_zone is not None:
+                    event_type = "Entered"
+                    zone_name = self.zone_name(inside_zone)
+                    # Show alert for entry
+                    self.alerts.show_entry_alert(oid, zone_name)
+                    if self.clip_recorder:
+                        clip_path = self.clip_recorder.trigger(f"obj{oid}_{zone_name}")
+
+                elif prev_zone is not None and inside_zone is None:
+                    event_type = "Exited"
+                    zone_name = self.zone_name(prev_zone)
+                    # Show alert for exit
+                    self.alerts.show_exit_alert(oid, zone_name)
+
+                elif prev_zone != inside_zone:
+                    event_type = "Moved"
+                    zone_name = self.zone_name(inside_zone)
+
+                if event_type:
+                    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    class_name = object_classes.get(oid, "Unknown")
+                    confidence = self.tracker.confidences.get(oid)
+                    self.event_sink.write([timestamp, oid, zone_name, event_type, class_name, confidence,
+                                           clip_path, self.frame_count, self.camera_name])
+                    self.events_logged += 1
+                    self.metrics.record_event(zone_name, event_type)
+                    prefix = f"[{self.camera_name}] " if self.camera_name else ""
+                    print(f"{prefix}[{timestamp}] Object {oid} ({class_name}) {event_type} {zone_name}")
+
+            self.object_zone_status[oid] = inside_zone
+
+        # Track IDs are never reused: forget the objects the tracker has dropped
+        lost = self.object_zone_status.keys() - object_centroids.keys()
+        if lost:
+            for oid in lost:
+                del self.object_zone_status[oid]
+            self.alerts.forget_objects(lost)
+
+    def draw_overlay(self, frame, object_centroids, object_classes):
+        """Draw tracked objects, zones and status text onto the frame"""
+        # Draw objects
+        for oid, (cx, cy) in object_centroids.items():
+            class_name = object_classes.get(oid, "Unknown")
+            color = (0, 255, 0) if self.object_zone_status.get(oid) is None else (0, 0, 255)
+
+            cv2.circle(frame, (cx, cy), 5, color, -1)
+            cv2.putText(frame, f"ID {oid} ({class_name})", (cx + 5, cy - 5),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+
+        # Draw zones
+        cv2.polylines(frame, self.zone_polygons, True, (255, 0, 0), 2)
+        for label, position in zip(self.zone_labels, self.zone_label_positions):
+            if position is None:
+                continue
+            center_x, center_y = position
+            cv2.putText(frame, label, (center_x-20, center_y),
                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
 
-    # Add status information
-    cv2.putText(frame, f"Frame: {frame_count} | Objects: {len(object_centroids)} | Zones: {len(zones)}", 
-               (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-    cv2.putText(frame, f"Press 'q' to quit", 
-               (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-
-    # Write frame if saving video
-    if video_writer:
-        video_writer.write(frame)
-
-    cv2.imshow("Zone Guard - Detection", frame)
-    if cv2.waitKey(1) & 0xFF == ord("q"):
-        break
-
-# ----------------- Cleanup -----------------
-cap.release()
-if video_writer:
-    video_writer.release()
-cv2.destroyAllWindows()
-close_logging()
-alert_system.cleanup()
-
-print(f"\nProcessing complete!")
-print(f"Processed {frame_count} frames")
-print(f"Tracked {object_id_count} objects")
-print(f"Logs saved to: {log_file_path}")
-if save_video:
-    print(f"Video saved to: {video_output}")
+        # Add status information
+        cv2.putText(frame, f"Frame: {self.frame_count} | Objects: {len(object_centroids)} | Zones: {len(self.zones)}",
+                   (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        if self.show_preview:
+            cv2.putText(frame, f"Press 'q' to quit",
+                       (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+
+        # Stage latencies (p50/p95), refreshed every 15 frames to keep it cheap
+        if self.timing_overlay:
+            if self.frame_count % 15 == 1:
+                self.timing_lines = self.timer.overlay_lines()
+            for row, line in enumerate(self.timing_lines):
+                cv2.putText(frame, line, (10, 90 + 20 * row),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+
+    # ----------------- Main Loop -----------------
+    def run(self):
+        """Process the video source to the end and return a summary dict"""
+        self.open_source()
+        try:
+            self.load_model()
+            self.setup_logging()
+            if self.config["metrics_enabled"]:
+                self.start_metrics_server()
+
+            print("Starting video processing...")
+            print(f"Monitoring classes: {list(self.detection_classes.keys())}")
+            print(f"Confidence threshold: {self.confidence_threshold}")
+            if self.show_preview:
+                print("Press 'q' to quit")
+            else:
+                print("Headless mode: preview disabled" + ("" if self.render_enabled else ", overlay drawing skipped"))
+
+            self.process_stream()
+        except KeyboardInterrupt:
+            print("\nInterrupted, shutting down...")
+        finally:
+            self.close()
+            self.write_summary()
+        return self.summary()
+
+    def process_stream(self):
+        """Read, detect and process batches until the source ends or the user quits"""
+        batch_size = self.config["inference_batch_size"]
+        progress_interval = self.config["progress_interval"]
+        progress_time = self.start_time = time.perf_counter()
+        progress_frames = 0
+        while True:
+            start = time.perf_counter()
+            frames = read_batch(self.frame_source, batch_size)
+            if not frames:
+                break
+            self.timer.record("capture", (time.perf_counter() - start) / len(frames))
+
+            results = self.detect(frames)
+
+            # Feed per-frame results through tracking and zone checks in order
+            for frame, result in zip(frames, results):
+                if not self.process_frame(frame, result):
+                    return
+                if self.frame_grabber:
+                    self.frame_grabber.release(frame)
+
+            # Periodic progress line, parsed by the main.py dashboard
+            now = time.perf_counter()
+            if progress_interval and now - progress_time >= progress_interval:
+                current_fps = (self.frame_count - progress_frames) / (now - progress_time)
+                print(f"[progress] frame={self.frame_count} fps={current_fps:.1f} "
+                      f"objects={len(self.tracker.centroids)}", flush=True)
+                progress_time, progress_frames = now, self.frame_count
+                self.write_summary()
+
+    def close(self):
+        """Flush logs and release capture, writers and windows"""
+        # ----------------- Cleanup -----------------
+        if self.start_time is not None:
+            self.elapsed = time.perf_counter() - self.start_time
+        if self.metrics_server:
+            self.metrics_server.stop()
+        if self.event_sink and self.owns_event_sink:
+            self.event_sink.close()
+        if self.frame_grabber:
+            self.frame_grabber.stop()
+        if self.cap:
+            self.cap.release()
+        if self.detection_recorder:
+            self.detection_recorder.close()
+        if self.clip_recorder:
+            self.clip_recorder.close()
+        if self.video_writer:
+            self.video_writer.release()
+        if self.frame_ring:
+            self.frame_ring.close()
+        if self.show_preview:
+            cv2.destroyAllWindows()
+
+    def summary(self):
+        """Counters and stage latencies describing the run so far"""
+        elapsed = self.elapsed or (time.perf_counter() - self.start_time if self.start_time else 0.0)
+        summary = {
+            "camera": self.camera_name or None,
+            "video_source": self.config["video_source"],
+            "frames": self.frame_count,
+            "elapsed_seconds": round(elapsed, 3),
+            "fps": round(self.frame_count / elapsed, 2) if elapsed else 0.0,
+            "objects": self.tracker.object_id_count,
+            "events": self.events_logged,
+            "log_file": self.log_file_path,
+        }
+        if self.motion_gate:
+            summary["frames_skipped"] = self.motion_gate.frames_skipped
+        if self.frame_grabber:
+            summary["frames_dropped"] = self.frame_grabber.frames_dropped
+        if self.clip_recorder:
+            summary["clips_written"] = self.clip_recorder.clips_written
+            if self.clip_recorder.pre_rolls_skipped:
+                summary["clip_pre_rolls_skipped"] = self.clip_recorder.pre_rolls_skipped
+        if getattr(self.event_sink, "rows_dropped", 0):
+            summary["log_rows_dropped"] = self.event_sink.rows_dropped
+        if self.config["save_video"]:
+            summary["video_output"] = self.config["video_output"]
+            if isinstance(self.video_writer, AsyncVideoWriter):
+                summary["video_writer"] = self.video_writer.stats()
+        if self.timer.enabled:
+            summary["stages"] = self.timer.summary()
+        return summary
+
+    def write_summary(self):
+        """Write summary() as JSON to summary_file (replaced atomically)"""
+        path = self.config["summary_file"]
+        if not path:
+            return
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.summary(), f, indent=4)
+        os.replace(temp_path, path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Zone Guard detection and tracking")
+    parser.add_argument("--headless", action="store_true",
+                        help="Run without a preview window; overlays are drawn only when saving video")
+    args = parser.parse_args()
+
+    config = load_config()
+    config["headless"] = config["headless"] or args.headless
+    zones, zone_labels = load_zones(config["zones_file"])
+
+    # Turn SIGTERM into SystemExit so cleanup still flushes logs and video
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+
+    pipeline = DetectionPipeline(config, zones, zone_labels)
+    try:
+        summary = pipeline.run()
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        alert_system.cleanup()
+
+    print(json.dumps(summary, indent=4))
+
+if __name__ == "__main__":
+    main()
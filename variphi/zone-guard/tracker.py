@@ -0,0 +1,102 @@
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+def greedy_assignment(cost):
+    """One-to-one matching taking the globally cheapest pairs first.
+
+    Used when scipy is not installed. Returns (row_indices, col_indices)
+    like scipy.optimize.linear_sum_assignment.
+    """
+    rows, cols = [], []
+    if cost.size == 0:
+        return np.array(rows, dtype=int), np.array(cols, dtype=int)
+    used_rows = set()
+    used_cols = set()
+    for flat_index in np.argsort(cost, axis=None, kind="stable"):
+        row, col = divmod(int(flat_index), cost.shape[1])
+        if row in used_rows or col in used_cols:
+            continue
+        used_rows.add(row)
+        used_cols.add(col)
+        rows.append(row)
+        cols.append(col)
+        if len(used_rows) == cost.shape[0] or len(used_cols) == cost.shape[1]:
+            break
+    return np.array(rows, dtype=int), np.array(cols, dtype=int)
+
+class CentroidTracker:
+    """Centroid tracker with optimal detection-to-track assignment.
+
+    Each frame the full distance matrix between new detections and existing
+    tracks is computed with one NumPy broadcast, and the assignment that
+    minimises total distance is solved in one go, so two detections can
+    never claim the same track. Pairs further apart than distance_threshold
+    are never matched; unmatched detections start new tracks and unmatched
+    tracks are dropped, as in the original per-frame tracker.
+    """
+
+    def __init__(self, distance_threshold=50):
+        self.distance_threshold = distance_threshold
+        self.object_id_count = 0
+        self.centroids = {}      # id: (cx, cy)
+        self.classes = {}        # id: class_name
+        self.confidences = {}    # id: confidence
+        self.track_ids = np.empty(0, dtype=np.int64)
+        self.track_points = np.empty((0, 2), dtype=np.float64)
+
+    def distance_matrix(self, points):
+        """Distances from each detection (rows) to each track (columns)"""
+        diff = points[:, None, :] - self.track_points[None, :, :]
+        return np.hypot(diff[..., 0], diff[..., 1])
+
+    def match(self, points):
+        """Return a track id (or -1 for a new track) for each detection"""
+        assigned = np.full(len(points), -1, dtype=np.int64)
+        if len(points) == 0 or len(self.track_ids) == 0:
+            return assigned
+
+        distances = self.distance_matrix(points)
+        valid = distances < self.distance_threshold
+        if not valid.any():
+            return assigned
+
+        # Gated pairs get a cost no valid assignment can beat
+        gated_cost = self.distance_threshold * min(distances.shape) + 1.0
+        cost = np.where(valid, distances, gated_cost)
+        if linear_sum_assignment is not None:
+            rows, cols = linear_sum_assignment(cost)
+        else:
+            rows, cols = greedy_assignment(cost)
+
+        keep = valid[rows, cols]
+        assigned[rows[keep]] = self.track_ids[cols[keep]]
+        return assigned
+
+    def update(self, points, class_names, confidences):
+        """Assign IDs to this frame's detections and return {id: (cx, cy)}"""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        assigned = self.match(points)
+
+        updated_centroids = {}
+        updated_classes = {}
+        updated_confidences = {}
+        for i, oid in enumerate(assigned.tolist()):
+            if oid < 0:
+                self.object_id_count += 1
+                oid = self.object_id_count
+                assigned[i] = oid
+            updated_centroids[oid] = (int(points[i, 0]), int(points[i, 1]))
+            updated_classes[oid] = class_names[i]
+            updated_confidences[oid] = confidences[i]
+
+        # Every detection owns exactly one track, in detection order
+        self.track_ids = assigned
+        self.track_points = points
+        self.centroids = updated_centroids
+        self.classes = updated_classes
+        self.confidences = updated_confidences
+        return self.centroids
@@ -0,0 +1,403 @@
+import os
+import threading
+import queue
+import time
+from datetime import datetime
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+
+LIVE_SOURCE_PREFIXES = ("rtsp://", "rtmp://", "http://", "https://", "udp://", "tcp://")
+
+def is_live_source(source):
+    """Return True for camera indexes and network streams, False for files"""
+    if isinstance(source, int):
+        return True
+    source = str(source)
+    return source.isdigit() or source.lower().startswith(LIVE_SOURCE_PREFIXES)
+
+class SharedFrameRing:
+    """Fixed-size frame slots in one multiprocessing.shared_memory block.
+
+    Every slot holds one frame at the capture resolution, so stages can
+    pass slot indices instead of frame data: the capture thread decodes
+    straight into a slot, and another process can attach to the block by
+    name and read the same memory. acquire() hands out a free slot;
+    retain() and release() count the stages still using it, and the slot
+    returns to the free list when the count drops to zero.
+    """
+
+    def __init__(self, slot_count, height, width, channels=3, name=None):
+        self.slot_count = slot_count
+        self.frame_shape = (height, width, channels)
+        self.slot_bytes = height * width * channels
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=slot_count * self.slot_bytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.frames = np.ndarray((slot_count,) + self.frame_shape, dtype=np.uint8, buffer=self.shm.buf)
+        self.base_address = self.frames.ctypes.data
+        self.ref_counts = [0] * slot_count
+        self.free_slots = queue.Queue()
+        for slot in range(slot_count):
+            self.free_slots.put(slot)
+        self.lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        """Take a free slot (reference count 1); None on timeout"""
+        try:
+            slot = self.free_slots.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        self.ref_counts[slot] = 1
+        return slot
+
+    def slot_of(self, frame):
+        """Slot index when frame is a whole slot of this ring, else None"""
+        if not isinstance(frame, np.ndarray) or frame.shape != self.frame_shape:
+            return None
+        offset = frame.ctypes.data - self.base_address
+        if offset < 0 or offset % self.slot_bytes or offset // self.slot_bytes >= self.slot_count:
+            return None
+        return offset // self.slot_bytes
+
+    def retain(self, frame):
+        """Add a user to the slot holding frame (no-op for other frames)"""
+        slot = self.slot_of(frame)
+        if slot is not None:
+            with self.lock:
+                self.ref_counts[slot] += 1
+
+    def release(self, frame):
+        """Drop a user of the slot holding frame; frees the slot at zero"""
+        slot = frame if isinstance(frame, int) else self.slot_of(frame)
+        if slot is None:
+            return
+        with self.lock:
+            self.ref_counts[slot] -= 1
+            free = self.ref_counts[slot] == 0
+        if free:
+            self.free_slots.put(slot)
+
+    def close(self):
+        """Unmap the block; the creating process also removes it"""
+        self.frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+class FrameGrabber:
+    """Decode frames from a cv2.VideoCapture on a background thread.
+
+    Frames are handed over through a bounded queue so decoding overlaps with
+    inference. With the "block" policy the reader waits for free space, which
+    keeps every frame of a recording. With "drop_oldest" the oldest queued
+    frame is discarded instead, so a live feed never builds up lag.
+
+    With a SharedFrameRing, frames are decoded directly into ring slots and
+    the consumer must call release(frame) once it is done with each frame.
+    """
+
+    POLICIES = ("block", "drop_oldest")
+
+    def __init__(self, cap, queue_size=4, policy="block", frame_ring=None):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown capture policy: {policy}")
+        self.cap = cap
+        self.policy = policy
+        self.frame_ring = frame_ring
+        self.frame_queue = queue.Queue(maxsize=max(1, queue_size))
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self.is_running = False
+        self.finished = False
+        self.capture_thread = None
+
+    def start(self):
+        """Start the background capture thread"""
+        if not self.is_running:
+            self.is_running = True
+            self.capture_thread = threading.Thread(target=self._run_capture_loop, daemon=True)
+            self.capture_thread.start()
+        return self
+
+    def _run_capture_loop(self):
+        """Read frames until the source ends or stop() is called"""
+        while self.is_running:
+            if self.frame_ring is not None:
+                ret, frame = self._read_into_ring()
+            else:
+                ret, frame = self.cap.read()
+            if not ret:
+                break
+            self.frames_read += 1
+            self._put(frame)
+        # None marks the end of the stream for the consumer
+        self._put(None)
+
+    def _read_into_ring(self):
+        """Decode the next frame straight into a free ring slot"""
+        slot = None
+        while slot is None:
+            if not self.is_running:
+                return False, None
+            slot = self.frame_ring.acquire(timeout=0.1)
+        ret, frame = self.cap.read(self.frame_ring.frames[slot])
+        if not ret or self.frame_ring.slot_of(frame) != slot:
+            # End of stream, or OpenCV allocated a new array (frame size changed)
+            self.frame_ring.release(slot)
+        return ret, frame
+
+    def _put(self, item):
+        """Queue an item according to the selected policy"""
+        if self.policy == "drop_oldest":
+            while True:
+                try:
+                    self.frame_queue.put_nowait(item)
+                    return
+                except queue.Full:
+                    try:
+                        dropped = self.frame_queue.get_nowait()
+                        self.frames_dropped += 1
+                        self.release(dropped)
+                    except queue.Empty:
+                        pass
+        else:
+            while self.is_running or item is None:
+                try:
+                    self.frame_queue.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    if item is None and not self.is_running:
+                        return
+
+    def read(self):
+        """Return (ret, frame) like cv2.VideoCapture.read()"""
+        if self.finished:
+            return False, None
+        frame = self.frame_queue.get()
+        if frame is None:
+            self.finished = True
+            return False, None
+        return True, frame
+
+    def release(self, frame):
+        """Return a frame's ring slot once the consumer is done with it"""
+        if self.frame_ring is not None and frame is not None:
+            self.frame_ring.release(frame)
+
+    def stop(self):
+        """Stop the capture thread and wait for it to exit"""
+        self.is_running = False
+        if self.capture_thread:
+            self.capture_thread.join(timeout=2.0)
+            self.capture_thread = None
+        if self.frame_ring is not None:
+            # Drop unread frames so no views into the ring outlive it
+            while True:
+                try:
+                    self.release(self.frame_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+class AsyncVideoWriter:
+    """Encode frames on a background thread fed by a bounded queue.
+
+    write() only enqueues, so mp4v encoding no longer stalls the detection
+    loop. When the encoder falls behind and the queue is full, write()
+    waits for space (no frames are lost) and the wait is recorded in the
+    backpressure statistics. release() flushes every queued frame before
+    releasing the underlying cv2.VideoWriter. Frames living in a
+    SharedFrameRing are retained until encoded instead of being copied.
+    Instead of a writer, an opener (a callable returning one) can be given
+    so the file is opened on the writer thread as well.
+    """
+
+    def __init__(self, writer, queue_size=32, frame_ring=None, opener=None):
+        self.writer = writer
+        self.opener = opener
+        self.frame_ring = frame_ring
+        self.frame_queue = queue.Queue(maxsize=max(1, queue_size))
+        self.frames_written = 0
+        self.frames_queued = 0
+        self.blocked_writes = 0
+        self.blocked_seconds = 0.0
+        self.max_queue_depth = 0
+        self.writer_thread = threading.Thread(target=self._run_writer_loop, daemon=True)
+        self.writer_thread.start()
+
+    def _run_writer_loop(self):
+        """Write frames until the end-of-stream marker arrives"""
+        if self.writer is None:
+            self.writer = self.opener()
+        while True:
+            frame = self.frame_queue.get()
+            if frame is None:
+                break
+            self.writer.write(frame)
+            self.frames_written += 1
+            if self.frame_ring is not None:
+                self.frame_ring.release(frame)
+
+    def write(self, frame):
+        """Queue a frame for encoding"""
+        if self.frame_ring is not None:
+            self.frame_ring.retain(frame)
+        try:
+            self.frame_queue.put_nowait(frame)
+        except queue.Full:
+            self.blocked_writes += 1
+            start = time.perf_counter()
+            self.frame_queue.put(frame)
+            self.blocked_seconds += time.perf_counter() - start
+        self.frames_queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.frame_queue.qsize())
+
+    def stats(self):
+        """Backpressure statistics for reporting"""
+        return {
+            "frames_written": self.frames_written,
+            "frames_queued": self.frames_queued,
+            "blocked_writes": self.blocked_writes,
+            "blocked_seconds": round(self.blocked_seconds, 3),
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+    def release(self):
+        """Flush queued frames and release the underlying writer"""
+        if self.writer_thread is not None:
+            self.frame_queue.put(None)
+            self.writer_thread.join()
+            self.writer_thread = None
+        self.writer.release()
+
+class FrameRingBuffer:
+    """Fixed-size ring of frames preallocated as one array.
+
+    push() copies into the next slot, so keeping the last N frames costs no
+    per-frame allocation.
+    """
+
+    def __init__(self, capacity, height, width, channels=3):
+        self.capacity = max(0, int(capacity))
+        self.frames = np.empty((self.capacity, height, width, channels), dtype=np.uint8)
+        self.next_index = 0
+        self.count = 0
+
+    def push(self, frame):
+        """Copy a frame into the ring, overwriting the oldest when full"""
+        if self.capacity == 0:
+            return
+        np.copyto(self.frames[self.next_index], frame)
+        self.next_index = (self.next_index + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def ordered(self):
+        """Views of the buffered frames, oldest first"""
+        start = (self.next_index - self.count) % self.capacity if self.capacity else 0
+        return [self.frames[(start + i) % self.capacity] for i in range(self.count)]
+
+    def clear(self):
+        self.next_index = 0
+        self.count = 0
+
+class ClipRecorder:
+    """Record short per-event clips with pre-roll and post-roll.
+
+    Every frame is pushed into a FrameRingBuffer holding the last
+    pre_roll_seconds. trigger() starts a clip, queues the buffered pre-roll
+    and keeps recording for post_roll_seconds. A trigger while a clip is
+    already recording extends that clip and returns its path.
+
+    Nothing slow happens on the caller's thread: the clip file is opened on
+    the clip's writer thread and finished clips are flushed and closed by a
+    background closer that close() waits for. Two pre-roll rings are
+    preallocated and swapped: a clip's encoder reads one while the next
+    pre-roll fills the other. If the encoder has not yet read the other
+    ring when it is needed, pre-roll frames are skipped (and the skipped
+    pre-rolls counted) rather than overwritten.
+    """
+
+    def __init__(self, width, height, fps, clip_dir="clips", pre_roll_seconds=2.0,
+                 post_roll_seconds=5.0, queue_size=64, frame_ring=None):
+        self.width = width
+        self.height = height
+        self.fps = fps if fps and fps > 0 else 25
+        self.clip_dir = clip_dir
+        self.frame_ring = frame_ring
+        self.post_roll_frames = max(1, int(round(post_roll_seconds * self.fps)))
+        self.pre_roll_frames = int(round(pre_roll_seconds * self.fps))
+        self.rings = [FrameRingBuffer(self.pre_roll_frames, height, width) for _ in range(2)]
+        self.ring_readers = [None, None]  # per ring: (writer, pre-roll frames it still has to encode)
+        self.ring_index = 0
+        # Room for the whole pre-roll, so trigger() never waits on the encoder
+        self.queue_size = self.pre_roll_frames + queue_size
+        self.closers = []
+        self.writer = None
+        self.clip_path = None
+        self.frames_remaining = 0
+        self.clips_written = 0
+        self.pre_rolls_skipped = 0
+        os.makedirs(clip_dir, exist_ok=True)
+
+    def _ring_free(self, index):
+        """Whether the encoder reading this ring has written all of its frames"""
+        reader = self.ring_readers[index]
+        if reader is not None:
+            writer, frame_count = reader
+            if writer.frames_written < frame_count:
+                return False
+            self.ring_readers[index] = None
+        return True
+
+    def trigger(self, name):
+        """Start (or extend) a clip for an event and return its file path"""
+        if self.writer is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            safe_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in str(name))
+            self.clip_path = os.path.join(self.clip_dir, f"{timestamp}_{safe_name}.mp4")
+            path = self.clip_path
+            opener = lambda: cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), self.fps,
+                                             (self.width, self.height))
+            self.writer = AsyncVideoWriter(None, self.queue_size, self.frame_ring, opener=opener)
+            if self._ring_free(self.ring_index):
+                # The clip reads this ring's frames; the next pre-roll goes to the other one
+                frames = self.rings[self.ring_index].ordered()
+                for frame in frames:
+                    self.writer.write(frame)
+                self.ring_readers[self.ring_index] = (self.writer, len(frames))
+                self.ring_index = 1 - self.ring_index
+                self.rings[self.ring_index].clear()
+            else:
+                self.pre_rolls_skipped += 1
+        self.frames_remaining = self.post_roll_frames
+        return self.clip_path
+
+    def add_frame(self, frame):
+        """Feed the next frame; written to the active clip or kept as pre-roll"""
+        if self.writer is not None:
+            self.writer.write(frame)
+            self.frames_remaining -= 1
+            if self.frames_remaining <= 0:
+                self._finish_clip()
+        elif self._ring_free(self.ring_index):
+            self.rings[self.ring_index].push(frame)
+
+    def _finish_clip(self):
+        """Hand the active clip to a background thread that flushes and closes it"""
+        self.closers = [closer for closer in self.closers if closer.is_alive()]
+        closer = threading.Thread(target=self.writer.release, daemon=True)
+        closer.start()
+        self.closers.append(closer)
+        self.writer = None
+        self.clips_written += 1
+
+    def close(self):
+        """Finish any clip still recording and wait until every clip is written"""
+        if self.writer is not None:
+            self._finish_clip()
+        for closer in self.closers:
+            closer.join()
+        self.closers = []
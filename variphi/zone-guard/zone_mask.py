@@ -0,0 +1,100 @@
+import cv2
+import numpy as np
+
+NO_ZONE = -1
+
+def zone_polygon_arrays(zones):
+    """Convert zone point lists to the int32 (N, 1, 2) arrays OpenCV expects"""
+    return [np.array(poly, dtype=np.int32).reshape((-1, 1, 2)) for poly in zones]
+
+def zones_bounding_box(zones, width, height, margin=0):
+    """Union bounding box (x1, y1, x2, y2) of all zones, padded and clipped to the frame.
+
+    Returns None when there are no zone points.
+    """
+    points = [p for poly in zones for p in poly]
+    if not points:
+        return None
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    x1 = max(0, min(xs) - margin)
+    y1 = max(0, min(ys) - margin)
+    x2 = min(width, max(xs) + margin + 1)
+    y2 = min(height, max(ys) + margin + 1)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return x1, y1, x2, y2
+
+class ZoneMask:
+    """Zones rasterized once into per-pixel lookup tables.
+
+    labels holds the index of the first zone covering each pixel (NO_ZONE
+    elsewhere), matching the "first matching zone wins" order of the
+    original pointPolygonTest loop. bits holds one bit per zone so
+    overlapping zones can all be reported for a point.
+    """
+
+    MAX_BITMASK_ZONES = 64
+
+    def __init__(self, zones, width, height, with_bitmask=False):
+        if width <= 0 or height <= 0:
+            raise ValueError(f"Invalid frame size for zone mask: {width}x{height}")
+        self.width = width
+        self.height = height
+        self.zone_count = len(zones)
+        polygons = zone_polygon_arrays(zones)
+
+        self.labels = np.full((height, width), NO_ZONE, dtype=np.int16)
+        # Paint in reverse so earlier zones overwrite later ones where they overlap
+        for idx in range(len(polygons) - 1, -1, -1):
+            cv2.fillPoly(self.labels, [polygons[idx]], idx)
+
+        self.bits = None
+        if with_bitmask:
+            if self.zone_count > self.MAX_BITMASK_ZONES:
+                raise ValueError(f"Bitmask supports at most {self.MAX_BITMASK_ZONES} zones")
+            self.bits = np.zeros((height, width), dtype=np.uint64)
+            layer = np.zeros((height, width), dtype=np.uint8)
+            for idx, polygon in enumerate(polygons):
+                layer.fill(0)
+                cv2.fillPoly(layer, [polygon], 1)
+                self.bits[layer.astype(bool)] |= np.uint64(1 << idx)
+
+    def _pixel_indices(self, points):
+        """Return (ys, xs, inside) for an (N, 2) array of (x, y) points"""
+        points = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+        xs = points[:, 0]
+        ys = points[:, 1]
+        inside = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        return np.clip(ys, 0, self.height - 1), np.clip(xs, 0, self.width - 1), inside
+
+    def lookup(self, points):
+        """Zone index for each point (NO_ZONE when outside every zone)"""
+        ys, xs, inside = self._pixel_indices(points)
+        return np.where(inside, self.labels[ys, xs], NO_ZONE)
+
+    def lookup_bits(self, points):
+        """Bitmask of every zone containing each point"""
+        if self.bits is None:
+            raise ValueError("ZoneMask was built without with_bitmask=True")
+        ys, xs, inside = self._pixel_indices(points)
+        return np.where(inside, self.bits[ys, xs], np.uint64(0))
+
+    def zone_index(self, cx, cy):
+        """Zone index for a single point, or None"""
+        if 0 <= cx < self.width and 0 <= cy < self.height:
+            idx = int(self.labels[cy, cx])
+            return None if idx == NO_ZONE else idx
+        return None
+
+def zones_from_bits(bits):
+    """List the zone indices set in a bitmask value"""
+    bits = int(bits)
+    indices = []
+    idx = 0
+    while bits:
+        if bits & 1:
+            indices.append(idx)
+        bits >>= 1
+        idx += 1
+    return indices